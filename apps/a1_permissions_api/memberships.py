@@ -0,0 +1,75 @@
+"""
+Group membership changes for many users at once.
+
+Rows are written straight to the ``User.groups`` through table: one
+``INSERT ... IGNORE``-style bulk_create to add, one ``DELETE ... IN`` to
+remove (per ``chunk_size`` users), instead of a manager call plus a full
+``user.save()`` per user. One m2m_changed pre/post pair is sent per call,
+from the group side (``reverse=True``), so the permission and list caches
+are invalidated once.
+"""
+
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+
+from lms_api.bulk_actions import BULK_CHUNK_SIZE
+from user.models import User
+
+UserGroup = User.groups.through
+
+
+def _send(action, group, user_ids, using):
+    m2m_changed.send(
+        sender=UserGroup,
+        action=action,
+        instance=group,
+        reverse=True,
+        model=User,
+        pk_set=user_ids,
+        using=using,
+    )
+
+
+def add_users_to_group(group, user_ids, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Make every user in ``user_ids`` a member of ``group``; existing
+    memberships are left as they are. ``pk_set`` in the signals holds all
+    the requested ids, including users that already were members.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    using = router.db_for_write(UserGroup, instance=group)
+    with transaction.atomic(using=using):
+        _send("pre_add", group, user_ids, using)
+        UserGroup.objects.using(using).bulk_create(
+            [UserGroup(user_id=user_id, group_id=group.pk) for user_id in user_ids],
+            batch_size=chunk_size,
+            ignore_conflicts=True,
+        )
+        _send("post_add", group, user_ids, using)
+
+
+def remove_users_from_group(group, user_ids, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Remove every user in ``user_ids`` from ``group``. Returns the number of
+    memberships deleted.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return 0
+    using = router.db_for_write(UserGroup, instance=group)
+    ids = list(user_ids)
+    deleted = 0
+    with transaction.atomic(using=using):
+        _send("pre_remove", group, user_ids, using)
+        for start in range(0, len(ids), chunk_size):
+            # Nothing listens to the through model's own delete signals, so
+            # this is a single DELETE without fetching the rows
+            deleted += (
+                UserGroup.objects.using(using)
+                .filter(group_id=group.pk, user_id__in=ids[start : start + chunk_size])
+                .delete()[0]
+            )
+        _send("post_remove", group, user_ids, using)
+    return deleted
@@ -0,0 +1,169 @@
+import uuid
+
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from lms_api.custom_permissions import get_permission_snapshot
+from lms_api.testing import create_user
+from user.models import User
+
+ASSIGN_URL = "/en/api/permissions/assign_many_users_to_group/"
+REMOVE_URL = "/en/api/permissions/remove_many_users_from_group/"
+GROUP_DELETE_URL = "/en/api/permissions/group_delete/"
+
+
+class PermissionSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(1)
+        self.group = Group.objects.create(name="editors")
+        self.user.groups.add(self.group)
+        self.view_user = Permission.objects.get(codename="view_user")
+        self.change_user = Permission.objects.get(codename="change_user")
+        self.group.permissions.add(self.view_user)
+
+    def fresh_user(self):
+        # A new object, as each request gets, so nothing is memoized on it
+        return User.objects.get(pk=self.user.pk)
+
+    def test_warm_snapshot_costs_no_query(self):
+        get_permission_snapshot(self.fresh_user())
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            permissions, group_codenames = get_permission_snapshot(user)
+        self.assertIn("user.view_user", permissions)
+        self.assertEqual(group_codenames, {"view_user"})
+
+    def test_group_permission_change_invalidates_snapshot(self):
+        get_permission_snapshot(self.fresh_user())
+        self.group.permissions.add(self.change_user)
+        permissions, group_codenames = get_permission_snapshot(self.fresh_user())
+        self.assertIn("user.change_user", permissions)
+        self.assertIn("change_user", group_codenames)
+
+    def test_membership_change_invalidates_snapshot(self):
+        get_permission_snapshot(self.fresh_user())
+        self.user.groups.remove(self.group)
+        self.assertEqual(
+            get_permission_snapshot(self.fresh_user()), (frozenset(), frozenset())
+        )
+
+    def test_group_delete_invalidates_snapshot(self):
+        get_permission_snapshot(self.fresh_user())
+        self.group.delete()
+        permissions, _group_codenames = get_permission_snapshot(self.fresh_user())
+        self.assertNotIn("user.view_user", permissions)
+
+
+class BulkMembershipTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        admin = create_user(0, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.group = Group.objects.create(name="students")
+        self.users = User.objects.bulk_create(
+            User(
+                email=f"user{i}@a.com",
+                mobile_number=f"01{i:09d}",
+                name=f"user{i}",
+                name_ar=f"user{i}",
+                identification="123456789",
+                position="p",
+                user_type="student",
+            )
+            for i in range(1, 31)
+        )
+
+    def put(self, url, users):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(
+                url,
+                {"group_id": self.group.pk, "user_id": [str(u.pk) for u in users]},
+                format="json",
+            )
+        return response, len(queries)
+
+    def members(self):
+        return set(self.group.user_set.values_list("pk", flat=True))
+
+    def test_assign_costs_the_same_for_any_number_of_users(self):
+        response, few = self.put(ASSIGN_URL, self.users[:2])
+        self.assertEqual(response.status_code, 200)
+        response, many = self.put(ASSIGN_URL, self.users[2:])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(many, few)
+        self.assertEqual(self.members(), {user.pk for user in self.users})
+
+    def test_assign_keeps_existing_memberships(self):
+        self.put(ASSIGN_URL, self.users[:5])
+        response, _queries = self.put(ASSIGN_URL, self.users[:10])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.members(), {user.pk for user in self.users[:10]})
+
+    def test_unknown_user_assigns_nobody(self):
+        unknown = User(pk=uuid.uuid4())
+        response, _queries = self.put(ASSIGN_URL, self.users[:5] + [unknown])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.members(), set())
+
+    def test_remove_costs_the_same_for_any_number_of_users(self):
+        self.put(ASSIGN_URL, self.users)
+        response, few = self.put(REMOVE_URL, self.users[:2])
+        self.assertEqual(response.status_code, 204)
+        response, many = self.put(REMOVE_URL, self.users[2:20])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(many, few)
+        self.assertEqual(self.members(), {user.pk for user in self.users[20:]})
+
+    def test_assign_invalidates_permission_snapshot(self):
+        user = self.users[0]
+        self.group.permissions.add(Permission.objects.get(codename="view_user"))
+        _permissions, group_codenames = get_permission_snapshot(
+            User.objects.get(pk=user.pk)
+        )
+        self.assertEqual(group_codenames, set())
+        self.put(ASSIGN_URL, [user])
+        _permissions, group_codenames = get_permission_snapshot(
+            User.objects.get(pk=user.pk)
+        )
+        self.assertEqual(group_codenames, {"view_user"})
+
+
+class GroupBulkDeleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(create_user(0, is_superuser=True))
+        self.groups = [Group.objects.create(name=f"group{i}") for i in range(5)]
+
+    def delete(self, group_ids):
+        return self.client.delete(
+            GROUP_DELETE_URL, {"group_id": group_ids}, format="json"
+        )
+
+    def names(self):
+        groups = Group.objects.filter(name__startswith="group")
+        return set(groups.values_list("name", flat=True))
+
+    def test_groups_and_their_memberships_are_deleted(self):
+        user = create_user(1)
+        user.groups.add(self.groups[0])
+        response = self.delete([group.pk for group in self.groups[:3]])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.names(), {"group3", "group4"})
+        self.assertFalse(user.groups.exists())
+
+    def test_missing_ids_are_reported_and_nothing_is_deleted(self):
+        response = self.delete([self.groups[0].pk, 999999, "not-an-id"])
+        self.assertEqual(response.status_code, 404)
+        self.assertCountEqual(response.data["missing_ids"], [999999, "not-an-id"])
+        self.assertEqual(len(self.names()), 5)
+
+    def test_no_ids_is_rejected(self):
+        self.assertEqual(self.delete([]).status_code, 400)
+        self.assertEqual(len(self.names()), 5)
@@ -6,15 +6,19 @@ from rest_framework.response import Response
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 
-from rest_framework_simplejwt.authentication import JWTAuthentication
-
 from apps.a1_permissions_api.serializers import (
     PermissionSerializer,
     GroupSerializer,
     PermissionDialogSerializer,
     GroupDialogSerializer,
 )
+from apps.a1_permissions_api.memberships import (
+    add_users_to_group,
+    remove_users_from_group,
+)
+from lms_api.bulk_actions import BulkDeleteMixin, resolve_ids
 from lms_api.pagination import StandardResultsSetPagination
+from lms_api.authentication import StatelessJWTAuthentication
 from lms_api.custom_permissions import HasPermissionOrInGroupWithPermission
 
 from user.models import User
@@ -24,7 +28,7 @@ from user.serializers import UserSerializer
 class PermissionListView(generics.ListAPIView):
     queryset = Permission.objects.all()
     serializer_class = PermissionSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "view_permission"
 
@@ -34,13 +38,13 @@ class PermissionListView(generics.ListAPIView):
 class PermissionDialogView(generics.ListAPIView):
     queryset = Permission.objects.all()
     serializer_class = PermissionDialogSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "view_permission"
 
 
 class AssignPermissionsToGroupView(generics.CreateAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "add_permission"
 
@@ -65,7 +69,7 @@ class AssignPermissionsToGroupView(generics.CreateAPIView):
 
 
 class AssignPermissionsToUserView(generics.CreateAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "add_permission"
 
@@ -90,7 +94,7 @@ class AssignPermissionsToUserView(generics.CreateAPIView):
 
 
 class RemovePermissionsFromGroupView(generics.UpdateAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "change_group"
 
@@ -115,7 +119,7 @@ class RemovePermissionsFromGroupView(generics.UpdateAPIView):
 
 
 class RemovePermissionsFromUserView(generics.UpdateAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "change_permission"
 
@@ -143,7 +147,7 @@ class RemovePermissionsFromUserView(generics.UpdateAPIView):
 class GroupListView(generics.ListAPIView):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     # permission_codename = "view_group"
     permission_codename = "view_group"
@@ -153,7 +157,7 @@ class GroupListView(generics.ListAPIView):
 
 class GroupRetrieveView(generics.RetrieveAPIView):
     serializer_class = GroupSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "view_group"
     lookup_field = "id"
@@ -166,7 +170,7 @@ class GroupRetrieveView(generics.RetrieveAPIView):
 
 class GroupCreateView(generics.CreateAPIView):
     serializer_class = GroupSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "add_group"
 
@@ -189,7 +193,7 @@ class GroupCreateView(generics.CreateAPIView):
 
 class GroupUpdateView(generics.UpdateAPIView):
     serializer_class = GroupSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "change_group"
 
@@ -224,7 +228,7 @@ class GroupUpdateView(generics.UpdateAPIView):
 
 class GroupUpdatePermissionsView(generics.UpdateAPIView):
     serializer_class = GroupSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "change_group"
 
@@ -251,43 +255,29 @@ class GroupUpdatePermissionsView(generics.UpdateAPIView):
         )
 
 
-class GroupDeleteView(generics.DestroyAPIView):
+class GroupDeleteView(BulkDeleteMixin, generics.DestroyAPIView):
     serializer_class = GroupSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "delete_group"
-
-    def delete(self, request, *args, **kwargs):
-
-        group_ids = request.data.get("group_id", [])
-
-        if not group_ids:
-            return Response(
-                {"detail": _("No group IDs provided")},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        for group_id in group_ids:
-            group = get_object_or_404(Group, id=group_id)
-            group.delete()
-
-        return Response(
-            {"detail": _("Groups permanently deleted successfully")},
-            status=status.HTTP_204_NO_CONTENT,
-        )
+    model = Group
+    ids_param = "group_id"
+    no_ids_message = _("No group IDs provided")
+    missing_message = _("One or more groups not found")
+    success_message = _("Groups permanently deleted successfully")
 
 
 class GroupDialogView(generics.ListAPIView):
     queryset = Group.objects.all()
     serializer_class = GroupDialogSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "view_group"
 
 
 class AssignUserToGroupView(generics.UpdateAPIView):
     serializer_class = UserSerializer  # Replace with your User serializer
-    authentication_classes = [JWTAuthentication]  # Add your authentication classes
+    authentication_classes = [StatelessJWTAuthentication]  # Add your authentication classes
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "change_group"
 
@@ -320,7 +310,7 @@ class AssignUserToGroupView(generics.UpdateAPIView):
 
 class AssignManyUsersToGroupView(generics.UpdateAPIView):
     serializer_class = UserSerializer  # Use your User serializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "change_group"
 
@@ -335,18 +325,14 @@ class AssignManyUsersToGroupView(generics.UpdateAPIView):
                 {"detail": _("Group not found")}, status=status.HTTP_404_NOT_FOUND
             )
 
-        users = User.objects.filter(id__in=user_ids)
-        users_count = users.count()
-
-        if users_count != len(user_ids):
+        user_ids, missing = resolve_ids(User, user_ids)
+        if missing:
             return Response(
                 {"detail": _("One or more users not found")},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        for user in users:
-            user.groups.add(group)
-            user.save()
+        add_users_to_group(group, user_ids)
 
         return Response(
             {"detail": _("Users assigned to group successfully")},
@@ -357,7 +343,7 @@ class AssignManyUsersToGroupView(generics.UpdateAPIView):
 class RemoveUserFromGroupView(generics.UpdateAPIView):
     serializer_class = UserSerializer
     queryset = User.objects.all()  # This queryset can be customized based on your needs
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "change_group"
 
@@ -387,7 +373,7 @@ class RemoveUserFromGroupView(generics.UpdateAPIView):
 
 class RemoveManyUsersFromGroupView(generics.UpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "change_group"
 
@@ -402,18 +388,14 @@ class RemoveManyUsersFromGroupView(generics.UpdateAPIView):
                 {"detail": _("Group not found")}, status=status.HTTP_404_NOT_FOUND
             )
 
-        users = User.objects.filter(id__in=user_ids)
-        users_count = users.count()
-
-        if users_count != len(user_ids):
+        user_ids, missing = resolve_ids(User, user_ids)
+        if missing:
             return Response(
                 {"detail": _("One or more users not found")},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        for user in users:
-            user.groups.remove(group)
-            user.save()
+        remove_users_from_group(group, user_ids)
 
         return Response(
             {"detail": _("Users removed from group successfully")},
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AboutUsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.a2_about_us'
+
+    def ready(self):
+        from lms_api.utils import track_cache_generation
+        from apps.a2_about_us.models import AboutUs
+
+        track_cache_generation(AboutUs)
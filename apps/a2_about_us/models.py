@@ -1,18 +1,59 @@
-from django.db import models
-from django.db.models import Max
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, Max, Value, When
 
 from django.conf import settings
 
 import uuid
 
+from lms_api.utils import bump_cache_generation
+
 
 class AboutUsManager(models.Manager):
-    def reorder_indexes(self):
-        # Reorder the indexes based on the created_at field
-        for i, obj in enumerate(self.all().order_by("created_at")):
-            if obj.index != i:
-                obj.index = i
-                super(AboutUs, obj).save(update_fields=["index"])
+    """
+    Keeps ``index`` dense (0..n-1) with set-based UPDATEs. Rows are first
+    moved past the current maximum so the unique index never sees two rows
+    with the same value halfway through a statement.
+    """
+
+    def _offset(self):
+        max_index = self.aggregate(Max("index"))["index__max"]
+        return (max_index or 0) + 1
+
+    def _assign(self, positions):
+        # positions: {id: new index}; two UPDATEs whatever the row count
+        offset = self._offset()
+        rows = self.filter(id__in=list(positions))
+        rows.update(index=F("index") + offset)
+        rows.update(
+            index=Case(
+                *[When(id=pk, then=Value(index)) for pk, index in positions.items()],
+                output_field=models.PositiveIntegerField(),
+            )
+        )
+
+    def close_gap(self, index):
+        # Shift everything after a removed row down by one
+        with transaction.atomic():
+            rows = self.select_for_update().filter(index__gt=index)
+            offset = self._offset()
+            if rows.update(index=F("index") + offset):
+                self.filter(index__gt=offset).update(index=F("index") - offset - 1)
+        bump_cache_generation(self.model)
+
+    def set_order(self, ids):
+        """
+        Reorder the rows with ``ids`` to follow that order. They take over
+        the positions they occupy between them, so other rows don't move.
+        """
+        ids = list(dict.fromkeys(ids))
+        with transaction.atomic():
+            current = dict(
+                self.select_for_update().filter(id__in=ids).values_list("id", "index")
+            )
+            if len(current) != len(ids):
+                raise self.model.DoesNotExist
+            self._assign(dict(zip(ids, sorted(current.values()))))
+        bump_cache_generation(self.model)
 
 
 class AboutUs(models.Model):
@@ -52,17 +93,24 @@ class AboutUs(models.Model):
     objects = AboutUsManager()
 
     def save(self, *args, **kwargs):
-        if self.index is None:
+        if self.index is not None:
+            return super().save(*args, **kwargs)
+        # Append; a concurrent insert may take the same index first
+        for attempt in range(3):
             max_index = AboutUs.objects.aggregate(Max("index"))["index__max"]
             self.index = 0 if max_index is None else max_index + 1
-        super().save(*args, **kwargs)
-        # Reorder indexes after saving
-        AboutUs.objects.reorder_indexes()
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == 2:
+                    raise
 
     def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        # Reorder indexes after deletion
-        AboutUs.objects.reorder_indexes()
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            AboutUs.objects.close_gap(self.index)
+        return result
 
     class Meta:
-        ordering = ["created_at"]
+        ordering = ["index"]
@@ -0,0 +1,59 @@
+import uuid
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.a2_about_us.models import AboutUs
+from lms_api.testing import create_user
+
+ABOUT_US_DELETE_URL = "/en/api/about_us/aboutUs_delete/"
+ABOUT_US_REORDER_URL = "/en/api/about_us/aboutUs_reorder/"
+
+
+class AboutUsOrderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(create_user(0, is_superuser=True))
+        self.rows = [AboutUs.objects.create(x_account=f"x{i}") for i in range(4)]
+
+    def order(self):
+        return list(AboutUs.objects.values_list("x_account", "index"))
+
+    def reorder(self, ids):
+        return self.client.post(
+            ABOUT_US_REORDER_URL, {"aboutUs_id": ids}, format="json"
+        )
+
+    def test_new_rows_are_appended(self):
+        self.assertEqual(self.order(), [("x0", 0), ("x1", 1), ("x2", 2), ("x3", 3)])
+
+    def test_reorder_swaps_only_the_given_rows(self):
+        ids = [str(self.rows[3].pk), str(self.rows[1].pk)]
+        self.assertEqual(self.reorder(ids).status_code, 200)
+        self.assertEqual(self.order(), [("x0", 0), ("x3", 1), ("x2", 2), ("x1", 3)])
+
+    def test_reorder_all_rows(self):
+        ids = [str(row.pk) for row in reversed(self.rows)]
+        self.assertEqual(self.reorder(ids).status_code, 200)
+        self.assertEqual(self.order(), [("x3", 0), ("x2", 1), ("x1", 2), ("x0", 3)])
+
+    def test_reorder_with_unknown_ids_changes_nothing(self):
+        before = self.order()
+        for unknown in (str(uuid.uuid4()), "not-a-uuid"):
+            response = self.reorder([str(self.rows[0].pk), unknown])
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.reorder([]).status_code, 400)
+        self.assertEqual(self.order(), before)
+
+    def test_delete_closes_the_gap(self):
+        response = self.client.delete(
+            ABOUT_US_DELETE_URL,
+            {"aboutUs_id": [str(self.rows[1].pk), str(self.rows[2].pk)]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.order(), [("x0", 0), ("x3", 1)])
+        AboutUs.objects.create(x_account="x4")
+        self.assertEqual(self.order(), [("x0", 0), ("x3", 1), ("x4", 2)])
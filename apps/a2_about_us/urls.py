@@ -5,7 +5,7 @@ from apps.a2_about_us.views import (
     AboutUsRetrieveView,
     AboutUsUpdateView,
     AboutUsDeleteView,
-
+    AboutUsReorderView,
 )
 
 app_name = "about_us"
@@ -15,4 +15,5 @@ urlpatterns = [
     path("aboutUs_retrieve/", AboutUsRetrieveView.as_view(), name="aboutUs_retrieve"),
     path("aboutUs_update/", AboutUsUpdateView.as_view(), name="aboutUs_update"),
     path("aboutUs_delete/", AboutUsDeleteView.as_view(), name="aboutUs_delete"),
+    path("aboutUs_reorder/", AboutUsReorderView.as_view(), name="aboutUs_reorder"),
 ]
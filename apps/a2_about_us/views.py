@@ -3,6 +3,7 @@ import os
 from django.utils.translation import gettext_lazy as _
 from django.shortcuts import get_object_or_404
 from django.http import FileResponse, HttpResponse, JsonResponse
+from django.core.exceptions import ValidationError
 
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -13,15 +14,15 @@ from rest_framework import (
     status,
 )
 
-from rest_framework_simplejwt.authentication import JWTAuthentication
-
 from apps.a2_about_us.models import AboutUs
 from apps.a2_about_us.serializers import AboutUsSerializer
+from lms_api.authentication import StatelessJWTAuthentication
 from lms_api.custom_permissions import  HasPermissionOrInGroupWithPermission
+from lms_api.query_optimizer import OptimizedQuerySetMixin
 
 class AboutUsCreateView(generics.CreateAPIView):
     serializer_class = AboutUsSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename='about_us.add_aboutus'
     def perform_create(self, serializer):
@@ -48,11 +49,11 @@ class AboutUsCreateView(generics.CreateAPIView):
 #         # Get the first object from the queryset
 #         queryset = AboutUs.objects.all()[:1]
 #         return queryset
-class AboutUsListView(generics.ListAPIView):
+class AboutUsListView(OptimizedQuerySetMixin, generics.ListAPIView):
     queryset = AboutUs.objects.all()  # Remove any ordering
     serializer_class = AboutUsSerializer
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset().order_by('created_at')[:1]  # Apply ordering before slicing
+        queryset = self.get_queryset().order_by('index')[:1]  # Apply ordering before slicing
         serializer = self.get_serializer(queryset.first())
         return Response(serializer.data)
 
@@ -69,7 +70,7 @@ class AboutUsRetrieveView(generics.RetrieveAPIView):
 
 class AboutUsUpdateView(generics.UpdateAPIView):
     serializer_class = AboutUsSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename='about_us.change_aboutus'
     lookup_field = "id"
@@ -95,7 +96,7 @@ class AboutUsUpdateView(generics.UpdateAPIView):
 
 
 class AboutUsDeleteView(generics.DestroyAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename='about_us.delete_aboutus'
 
@@ -111,3 +112,27 @@ class AboutUsDeleteView(generics.DestroyAPIView):
         )
 
 
+class AboutUsReorderView(APIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
+    permission_codename='about_us.change_aboutus'
+
+    def post(self, request, *args, **kwargs):
+        # aboutUs_id: ids in their new order; they swap among their own positions
+        aboutUs_ids = request.data.get("aboutUs_id", [])
+        if not isinstance(aboutUs_ids, list) or not aboutUs_ids:
+            return Response(
+                {"detail": _("Provide the AboutUs ids in their new order")},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            AboutUs.objects.set_order(aboutUs_ids)
+        except (AboutUs.DoesNotExist, ValidationError):
+            return Response(
+                {"detail": _("AboutUs not found")},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return Response(
+            {"detail": _("AboutUs reordered successfully")}, status=status.HTTP_200_OK
+        )
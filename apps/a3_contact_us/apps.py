@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class A3ContactUsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.a3_contact_us'
+
+    def ready(self):
+        from lms_api.utils import track_cache_generation
+        from apps.a3_contact_us.models import ContactUs
+
+        track_cache_generation(ContactUs)
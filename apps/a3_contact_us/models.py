@@ -27,4 +27,8 @@ class ContactUs(models.Model):
     message= models.TextField(validators=[forbidden_characters_validator],max_length=3000)
     is_read= models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
\ No newline at end of file
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Keyset pagination walks (created_at, id)
+        indexes = [models.Index(fields=["created_at", "id"])]
@@ -9,12 +9,12 @@ from rest_framework import (
     status,
 )
 
-from rest_framework_simplejwt.authentication import JWTAuthentication
-
 from apps.a3_contact_us.models import ContactUs
 from .serializers import ContactUsSerializer, ContactUsReadSerializer
 
+from lms_api.bulk_actions import BulkDeleteMixin
 from lms_api.pagination import StandardResultsSetPagination
+from lms_api.authentication import StatelessJWTAuthentication
 from lms_api.custom_permissions import  HasPermissionOrInGroupWithPermission
 
 class ContactUSCreateView(generics.CreateAPIView):
@@ -33,7 +33,7 @@ class ContactUSCreateView(generics.CreateAPIView):
 
 class ContactUsListView(generics.ListAPIView):
     serializer_class = ContactUsSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename='contact_us.view_contactus'
     queryset = ContactUs.objects.all().order_by("-created_at")
@@ -42,7 +42,7 @@ class ContactUsListView(generics.ListAPIView):
 
 class ContactUsRetrieveView(generics.RetrieveAPIView):
     serializer_class = ContactUsSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename='contact_us.view_contactus'
     lookup_field = "id"
@@ -55,7 +55,7 @@ class ContactUsRetrieveView(generics.RetrieveAPIView):
 
 class ContactUsChangeRead(generics.UpdateAPIView):
     serializer_class = ContactUsReadSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename='contact_us.change_contactus'
 
@@ -76,18 +76,11 @@ class ContactUsChangeRead(generics.UpdateAPIView):
         )
 
 
-class ContactUsDeleteView(generics.DestroyAPIView):
-    authentication_classes = [JWTAuthentication]
+class ContactUsDeleteView(BulkDeleteMixin, generics.DestroyAPIView):
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename='contact_us.delete_contactus'
-
-    def delete(self, request, *args, **kwargs):
-        contactUs_ids = request.data.get("contactUs_id", [])
-        for contactUs_id in contactUs_ids:
-            instance = get_object_or_404(ContactUs, id=contactUs_id)
-            instance.delete()
-
-        return Response(
-            {"detail": _("ContactUs permanently deleted successfully")},
-            status=status.HTTP_204_NO_CONTENT,
-        )
+    model = ContactUs
+    ids_param = "contactUs_id"
+    missing_message = _("One or more ContactUs messages not found")
+    success_message = _("ContactUs permanently deleted successfully")
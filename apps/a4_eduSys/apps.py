@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class A4EdusysConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.a4_eduSys'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from lms_api.utils import register_detail_cache, track_cache_generation
+        from apps.a4_eduSys.models import EduSystem
+
+        track_cache_generation(EduSystem)
+        register_detail_cache(EduSystem, "edusys", related=[get_user_model()])
@@ -25,4 +25,7 @@ class EduSystem(models.Model):
         blank=True,
         null=True,
     )
-    
\ No newline at end of file
+
+    class Meta:
+        # Keyset pagination walks (created_at, id)
+        indexes = [models.Index(fields=["created_at", "id"])]
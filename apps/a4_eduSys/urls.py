@@ -10,6 +10,7 @@ from apps.a4_eduSys.views import (
     EduSysUpdateView,
     EduSysDeleteView,
     EduSysDialogView,
+    EduSysExportView,
 )
 
 app_name = "edusystem"
@@ -32,4 +33,5 @@ urlpatterns = [
     path("edusys_update/", EduSysUpdateView.as_view(), name="edu sys update"),
     path("edusys_delete/", EduSysDeleteView.as_view(), name="edu sys delete"),
     path("edusys_dialog/", EduSysDialogView.as_view(), name="edu sys dialog"),
+    path("edusys_export/", EduSysExportView.as_view(), name="edu sys export"),
 ]
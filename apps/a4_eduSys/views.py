@@ -1,15 +1,12 @@
 from django.utils.translation import gettext_lazy as _
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django.core.exceptions import ValidationError
 
 from rest_framework import status, generics
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from apps.a4_eduSys.models import EduSystem
 from apps.a4_eduSys.serializers import (
@@ -20,15 +17,21 @@ from apps.a4_eduSys.serializers import (
 from apps.a4_eduSys.filters import EduSysFilter
 
 from lms_api.pagination import StandardResultsSetPagination
+from lms_api.query_optimizer import OptimizedQuerySetMixin
+from lms_api.exporters import StreamingExportView
+from lms_api.bulk_actions import BulkStateChangeMixin
+from lms_api.authentication import StatelessJWTAuthentication
 from lms_api.custom_permissions import HasPermissionOrInGroupWithPermission
-from lms_api.utils import get_or_set_cache, cache_response, clear_cache_key
+from lms_api.utils import get_or_set_detail_cache, cache_response
+
+from user.models import User
 
 import uuid
 
 
 class EduSysCreateView(generics.CreateAPIView):
     serializer_class = EduSystemSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a4_eduSys.add_edusystem"
 
@@ -48,11 +51,10 @@ class EduSysCreateView(generics.CreateAPIView):
         )
 
 
-@method_decorator(cache_page(60 * 10), name="dispatch")  # 10 mins
-class EduSysListView(generics.ListAPIView):
+class EduSysListView(OptimizedQuerySetMixin, generics.ListAPIView):
     queryset = EduSystem.objects.filter(is_deleted=False).order_by("-created_at")
     serializer_class = EduSystemSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a4_eduSys.view_edusystem"
     pagination_class = StandardResultsSetPagination
@@ -71,12 +73,19 @@ class EduSysListView(generics.ListAPIView):
         "-created_at",
     ]
 
+    @cache_response(
+        timeout=60 * 10,  # 10 mins
+        key_prefix="edusys_list",
+        models=[EduSystem, User],
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
-@method_decorator(cache_page(60 * 10), name="dispatch")  # 10 mins
-class EduSysDeletedListView(generics.ListAPIView):
+class EduSysDeletedListView(OptimizedQuerySetMixin, generics.ListAPIView):
     queryset = EduSystem.objects.filter(is_deleted=True).order_by("-created_at")
     serializer_class = EduSystemSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a4_eduSys.view_edusystem"
     pagination_class = StandardResultsSetPagination
@@ -95,10 +104,18 @@ class EduSysDeletedListView(generics.ListAPIView):
         "-created_at",
     ]
 
+    @cache_response(
+        timeout=60 * 10,  # 10 mins
+        key_prefix="edusys_deleted_list",
+        models=[EduSystem, User],
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class EduSysRetrieveView(generics.RetrieveAPIView):
     serializer_class = EduSystemSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a4_eduSys.view_edusystem"
     lookup_field = "id"
@@ -108,102 +125,52 @@ class EduSysRetrieveView(generics.RetrieveAPIView):
 
     def get_object(self):
         edusys_id = self.request.query_params.get("edusys_id")
-        cache_key = f"edusys_detail_{edusys_id}"
-        return get_or_set_cache(
-            cache_key,
-            lambda: get_object_or_404(self.get_queryset(), id=edusys_id),
+        return get_object_or_404(self.get_queryset(), id=edusys_id)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Cache the serialized payload; invalidated from EduSystem signals
+        edusys_id = request.query_params.get("edusys_id")
+        data = get_or_set_detail_cache(
+            "edusys",
+            edusys_id,
+            lambda: self.get_serializer(self.get_object()).data,
             timeout=300,
         )
+        return Response(data)
 
 
-class EduSysDeleteTemporaryView(generics.UpdateAPIView):
+class EduSysDeleteTemporaryView(BulkStateChangeMixin, generics.UpdateAPIView):
     serializer_class = EduSysIsDeletedSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a4_eduSys.delete_edusystem"
-
-    def update(self, request, *args, **kwargs):
-        edusys_ids = request.data.get("edusys_id", [])
-        partial = kwargs.pop("partial", False)
-        is_deleted = request.data.get("is_deleted")
-
-        if is_deleted == False:
-            return Response(
-                {"detail": _("These educational systems are not deleted")},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        for edusys_id in edusys_ids:
-            instance = get_object_or_404(EduSystem, id=edusys_id)
-            if instance.is_deleted:
-                return Response(
-                    {
-                        "detail": _(
-                            "Edu sys with ID {} is already temp deleted".format(
-                                edusys_id
-                            )
-                        )
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            serializer = self.get_serializer(
-                instance, data=request.data, partial=partial
-            )
-            serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
-            clear_cache_key(f"edusys_detail_{edusys_id}")
-
-        return Response(
-            {"detail": _("Educational Systems temp deleted successfully")},
-            status=status.HTTP_200_OK,
-        )
+    model = EduSystem
+    ids_param = "edusys_id"
+    state_value = True
+    detail_cache_prefix = "edusys"
+    conflicting_state_message = _("These educational systems are not deleted")
+    already_in_state_message = _("Edu sys with ID {} is already temp deleted")
+    success_message = _("Educational Systems temp deleted successfully")
 
 
-class EduSysRestoreView(generics.RetrieveUpdateAPIView):
+class EduSysRestoreView(BulkStateChangeMixin, generics.RetrieveUpdateAPIView):
 
     serializer_class = EduSysIsDeletedSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a4_eduSys.delete_edusystem"
-
-    def update(self, request, *args, **kwargs):
-        edusys_ids = request.data.get("edusys_id", [])
-        partial = kwargs.pop("partial", False)
-        is_deleted = request.data.get("is_deleted")
-
-        if is_deleted == True:
-            return Response(
-                {"detail": _("Educational system are already deleted")},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        for edusys_id in edusys_ids:
-            instance = get_object_or_404(EduSystem, id=edusys_id)
-            if instance.is_deleted == False:
-                return Response(
-                    {
-                        "detail": _(
-                            "Educational system with ID {} is not deleted".format(
-                                edusys_id
-                            )
-                        )
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            serializer = self.get_serializer(
-                instance, data=request.data, partial=partial
-            )
-            serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
-            clear_cache_key(f"edusystem_detail_{edusys_id}")
-
-        return Response(
-            {"detail": _("Educational System restored successfully")},
-            status=status.HTTP_200_OK,
-        )
+    model = EduSystem
+    ids_param = "edusys_id"
+    state_value = False
+    detail_cache_prefix = "edusys"
+    conflicting_state_message = _("Educational system are already deleted")
+    already_in_state_message = _("Educational system with ID {} is not deleted")
+    success_message = _("Educational System restored successfully")
 
 
 class EduSysUpdateView(generics.UpdateAPIView):
     serializer_class = EduSystemSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a4_eduSys.change_edusystem"
     lookup_field = "id"
@@ -219,7 +186,6 @@ class EduSysUpdateView(generics.UpdateAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-        clear_cache_key(f"edusystem_detail_{instance.id}")
 
         return Response(
             {"detail": _("Educational Systems Updated successfully")},
@@ -228,7 +194,7 @@ class EduSysUpdateView(generics.UpdateAPIView):
 
 
 class EduSysDeleteView(generics.DestroyAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a4_eduSys.delete_edusystem"
     import uuid
@@ -246,8 +212,6 @@ class EduSysDeleteView(generics.DestroyAPIView):
 
         # Check if each UUID is valid
         for uid in edusys_ids:
-            clear_cache_key(f"edusystem_detail_{uid}")
-
             try:
                 uuid.UUID(uid.strip())
             except ValueError:
@@ -270,6 +234,29 @@ class EduSysDeleteView(generics.DestroyAPIView):
 
 class EduSysDialogView(generics.ListAPIView):
     serializer_class = EduSysDialogSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated]
     queryset = EduSystem.objects.filter(is_deleted=False).order_by("-created_at")
+
+
+class EduSysExportView(StreamingExportView):
+    queryset = EduSystem.objects.filter(is_deleted=False)
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
+    permission_codename = "a4_eduSys.view_edusystem"
+    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filterset_class = EduSysFilter
+    search_fields = [
+        "name",
+        "name_ar",
+    ]
+    export_fields = [
+        "id",
+        "name",
+        "name_ar",
+        "description",
+        "is_active",
+        "created_at",
+        "updated_at",
+    ]
+    export_filename = "edu_systems"
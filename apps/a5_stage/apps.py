@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class A5StageConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.a5_stage'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from lms_api.utils import register_detail_cache, track_cache_generation
+        from apps.a4_eduSys.models import EduSystem
+        from apps.a5_stage.models import Stage
+
+        track_cache_generation(Stage)
+        register_detail_cache(
+            Stage, "stage", related=[EduSystem, get_user_model()]
+        )
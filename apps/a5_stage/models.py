@@ -32,3 +32,7 @@ class Stage(models.Model):
         blank=True,
         null=True,
     )
+
+    class Meta:
+        # Keyset pagination walks (created_at, id)
+        indexes = [models.Index(fields=["created_at", "id"])]
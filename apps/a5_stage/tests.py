@@ -0,0 +1,270 @@
+import base64
+import csv
+import json
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.a4_eduSys.models import EduSystem
+from apps.a5_stage.models import Stage
+from lms_api.exporters import iter_rows
+from lms_api.pagination import CachedCountPaginator, get_cached_count
+from lms_api.testing import create_user
+
+STAGE_LIST_URL = "/en/api/stage/stage_list/"
+STAGE_EXPORT_URL = "/en/api/stage/stage_export/"
+STAGE_RETRIEVE_URL = "/en/api/stage/stage_retrieve/"
+STAGE_TEMP_DELETE_URL = "/en/api/stage/stage_temp_delete/"
+STAGE_RESTORE_URL = "/en/api/stage/stage_restore/"
+
+
+class StageTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = create_user(0, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.created = 0
+
+    def create_stages(self, count):
+        # Every stage has its own creator and system, so an N+1 would show
+        for _ in range(count):
+            self.created += 1
+            user = create_user(self.created)
+            edu_system = EduSystem.objects.create(
+                name=f"E{self.created}", name_ar=f"Ea{self.created}"
+            )
+            Stage.objects.create(
+                name=f"S{self.created}",
+                name_ar=f"Sa{self.created}",
+                edu_system=edu_system,
+                created_by=user,
+                updated_by=user,
+            )
+
+
+class StageListTests(StageTestCase):
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(STAGE_LIST_URL, {"page_size": 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), self.created)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_stages(2)
+        few = self.list_queries()
+        self.create_stages(8)
+        self.assertEqual(self.list_queries(), few)
+
+    def test_cached_list_costs_no_query(self):
+        self.create_stages(3)
+        self.list_queries()
+        self.assertEqual(self.list_queries(), 0)
+
+
+class StageRetrieveTests(StageTestCase):
+    def retrieve(self, stage_id):
+        response = self.client.get(STAGE_RETRIEVE_URL, {"stage_id": stage_id})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_update_invalidates_every_spelling_of_the_id(self):
+        self.create_stages(1)
+        stage = Stage.objects.get()
+        spellings = [str(stage.pk), str(stage.pk).upper(), stage.pk.hex]
+        for stage_id in spellings:
+            self.assertEqual(self.retrieve(stage_id)["name"], "S1")
+        stage.name = "S2"
+        stage.save()
+        for stage_id in spellings:
+            self.assertEqual(self.retrieve(stage_id)["name"], "S2")
+
+    def test_cached_payload_costs_no_query(self):
+        self.create_stages(1)
+        stage_id = str(Stage.objects.get().pk)
+        self.retrieve(stage_id)
+        with self.assertNumQueries(0):
+            self.retrieve(stage_id)
+
+    def test_malformed_id_is_not_found(self):
+        response = self.client.get(STAGE_RETRIEVE_URL, {"stage_id": "not-a-uuid"})
+        self.assertEqual(response.status_code, 404)
+
+
+class StageBulkStateTests(StageTestCase):
+    def change(self, url, names, **data):
+        ids = list(
+            Stage.objects.filter(name__in=names).values_list("pk", flat=True)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(
+                url, {"stage_id": [str(pk) for pk in ids], **data}, format="json"
+            )
+        return response, len(queries)
+
+    def deleted(self):
+        return set(Stage.objects.filter(is_deleted=True).values_list("name", flat=True))
+
+    def listed(self):
+        response = self.client.get(STAGE_LIST_URL, {"page_size": 100})
+        return {stage["name"] for stage in response.data["results"]}
+
+    def test_temp_delete_and_restore_in_one_update(self):
+        self.create_stages(10)
+        response, few = self.change(STAGE_TEMP_DELETE_URL, ["S1", "S2"])
+        self.assertEqual(response.status_code, 200)
+        response, many = self.change(STAGE_TEMP_DELETE_URL, ["S3", "S4", "S5", "S6"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(many, few)
+        self.assertEqual(self.deleted(), {"S1", "S2", "S3", "S4", "S5", "S6"})
+        response, _queries = self.change(STAGE_RESTORE_URL, ["S2", "S5"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.deleted(), {"S1", "S3", "S4", "S6"})
+
+    def test_list_cache_is_invalidated(self):
+        self.create_stages(3)
+        self.assertEqual(self.listed(), {"S1", "S2", "S3"})
+        self.change(STAGE_TEMP_DELETE_URL, ["S2"])
+        self.assertEqual(self.listed(), {"S1", "S3"})
+        self.change(STAGE_RESTORE_URL, ["S2"])
+        self.assertEqual(self.listed(), {"S1", "S2", "S3"})
+
+    def test_a_row_already_in_state_changes_nothing(self):
+        self.create_stages(3)
+        self.change(STAGE_TEMP_DELETE_URL, ["S1"])
+        response, _queries = self.change(STAGE_TEMP_DELETE_URL, ["S1", "S2"])
+        self.assertEqual(response.status_code, 400)
+        response, _queries = self.change(STAGE_RESTORE_URL, ["S1", "S3"])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.deleted(), {"S1"})
+
+    def test_unknown_or_malformed_id_changes_nothing(self):
+        self.create_stages(2)
+        stage_id = str(Stage.objects.get(name="S1").pk)
+        for unknown in (str(uuid.uuid4()), "not-a-uuid"):
+            response = self.client.put(
+                STAGE_TEMP_DELETE_URL, {"stage_id": [stage_id, unknown]}, format="json"
+            )
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.deleted(), set())
+
+    def test_conflicting_state_is_rejected(self):
+        self.create_stages(1)
+        response, _queries = self.change(
+            STAGE_TEMP_DELETE_URL, ["S1"], is_deleted=False
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.deleted(), set())
+
+
+class StageCountTests(StageTestCase):
+    def test_count_is_cached_until_a_write(self):
+        self.create_stages(2)
+        queryset = Stage.objects.filter(is_deleted=False)
+        self.assertEqual(get_cached_count(queryset), (2, True))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cached_count(queryset), (2, True))
+        self.create_stages(1)
+        self.assertEqual(get_cached_count(queryset), (3, True))
+
+    def test_empty_filters_count_zero(self):
+        self.create_stages(1)
+        for queryset in (Stage.objects.none(), Stage.objects.filter(pk__in=[])):
+            with self.assertNumQueries(0):
+                self.assertEqual(get_cached_count(queryset), (0, True))
+            self.assertEqual(CachedCountPaginator(queryset, 5).num_pages, 1)
+
+
+class StageCursorPaginationTests(StageTestCase):
+    def get_page(self, url=STAGE_LIST_URL, **params):
+        return self.client.get(url, {"pagination": "cursor", **params})
+
+    def test_pages_walk_every_row_newest_first(self):
+        self.create_stages(7)
+        names = []
+        response = self.get_page(page_size=3)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            names += [stage["name"] for stage in response.data["results"]]
+            if response.data["next"] is None:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(names, [f"S{i}" for i in range(7, 0, -1)])
+
+    def test_rows_inserted_while_paging_do_not_shift_pages(self):
+        self.create_stages(7)
+        oldest = Stage.objects.order_by("created_at", "id").first().created_at
+        names = []
+        response = self.get_page(page_size=3)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            names += [stage["name"] for stage in response.data["results"]]
+            if response.data["next"] is None:
+                break
+            # One row lands ahead of the cursor, one behind everything read
+            self.create_stages(2)
+            Stage.objects.filter(name=f"S{self.created}").update(
+                created_at=oldest - timedelta(minutes=self.created)
+            )
+            response = self.client.get(response.data["next"])
+        self.assertEqual(len(names), len(set(names)))
+        originals = [name for name in names if int(name[1:]) <= 7]
+        self.assertEqual(originals, [f"S{i}" for i in range(7, 0, -1)])
+        # Rows inserted behind the cursor are reached, the newer ones are not
+        self.assertEqual(
+            [name for name in names if int(name[1:]) > 7],
+            [f"S{i}" for i in range(9, self.created + 1, 2)],
+        )
+
+    def test_malformed_cursor_id_is_not_found(self):
+        cursor = base64.urlsafe_b64encode(
+            json.dumps(
+                {"c": "2024-01-01T00:00:00+00:00", "i": "not-a-uuid", "r": False}
+            ).encode()
+        ).decode()
+        self.assertEqual(self.get_page(cursor=cursor).status_code, 404)
+
+    def test_ordering_is_rejected(self):
+        response = self.get_page(ordering="name")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ordering", response.data)
+
+
+class StageExportTests(StageTestCase):
+    def export(self, **params):
+        response = self.client.get(STAGE_EXPORT_URL, params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_rows_are_read_in_batches(self):
+        self.create_stages(5)
+        rows = iter_rows(Stage.objects.all(), ["name"], chunk_size=2)
+        with self.assertNumQueries(3):
+            names = [row["name"] for row in rows]
+        self.assertEqual(
+            names, list(Stage.objects.order_by("pk").values_list("name", flat=True))
+        )
+
+    def test_csv_export(self):
+        self.create_stages(3)
+        Stage.objects.filter(name="S3").update(is_deleted=True)
+        rows = list(csv.DictReader(self.export().splitlines()))
+        self.assertEqual(sorted(row["name"] for row in rows), ["S1", "S2"])
+        self.assertEqual(rows[0]["edu_system__name"], f"E{rows[0]['name'][1:]}")
+
+    def test_ndjson_export(self):
+        self.create_stages(2)
+        lines = self.export(export_format="ndjson").splitlines()
+        self.assertEqual(
+            sorted(json.loads(line)["name"] for line in lines), ["S1", "S2"]
+        )
+
+    def test_unsupported_format(self):
+        response = self.client.get(STAGE_EXPORT_URL, {"export_format": "xml"})
+        self.assertEqual(response.status_code, 400)
@@ -10,6 +10,7 @@ from apps.a5_stage.views import (
     StageUpdateView,
     StageDeleteView,
     StageDialogView,
+    StageExportView,
 )
 
 app_name = "stage"
@@ -30,4 +31,5 @@ urlpatterns = [
     path("stage_update/", StageUpdateView.as_view(), name="stage update"),
     path("stage_delete/", StageDeleteView.as_view(), name="stage delete"),
     path("stage_dialog/", StageDialogView.as_view(), name="stage dialog"),
+    path("stage_export/", StageExportView.as_view(), name="stage export"),
 ]
@@ -1,16 +1,14 @@
 from django.utils.translation import gettext_lazy as _
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django.core.exceptions import ValidationError
 
 from rest_framework import generics, status
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from apps.a4_eduSys.models import EduSystem
 from apps.a5_stage.models import Stage
 from apps.a5_stage.serializers import (
     StageSerializer,
@@ -20,13 +18,19 @@ from apps.a5_stage.serializers import (
 from apps.a5_stage.filters import StageFilter
 
 from lms_api.pagination import StandardResultsSetPagination
+from lms_api.query_optimizer import OptimizedQuerySetMixin
+from lms_api.exporters import StreamingExportView
+from lms_api.bulk_actions import BulkStateChangeMixin
+from lms_api.authentication import StatelessJWTAuthentication
 from lms_api.custom_permissions import HasPermissionOrInGroupWithPermission
-from lms_api.utils import get_or_set_cache, cache_response, clear_cache_key
+from lms_api.utils import get_or_set_detail_cache, cache_response
+
+from user.models import User
 
 
 class StageCreateView(generics.CreateAPIView):
     serializer_class = StageSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a5_stage.add_stage"
 
@@ -43,11 +47,10 @@ class StageCreateView(generics.CreateAPIView):
         return Response({"detail": _("Stage created successfully")})
 
 
-@method_decorator(cache_page(60 * 10), name="dispatch")  # 10 mins
-class StageListView(generics.ListAPIView):
+class StageListView(OptimizedQuerySetMixin, generics.ListAPIView):
     queryset = Stage.objects.filter(is_deleted=False).order_by("-created_at")
     serializer_class = StageSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a5_stage.view_stage"
     pagination_class = StandardResultsSetPagination
@@ -66,12 +69,19 @@ class StageListView(generics.ListAPIView):
         "-created_at",
     ]
 
+    @cache_response(
+        timeout=60 * 10,  # 10 mins
+        key_prefix="stage_list",
+        models=[Stage, EduSystem, User],
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
-@method_decorator(cache_page(60 * 10), name="dispatch")  # 10 mins
-class StageDeletedListView(generics.ListAPIView):
+class StageDeletedListView(OptimizedQuerySetMixin, generics.ListAPIView):
     queryset = Stage.objects.filter(is_deleted=True).order_by("-created_at")
     serializer_class = StageSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a5_stage.view_stage"
     pagination_class = StandardResultsSetPagination
@@ -90,10 +100,18 @@ class StageDeletedListView(generics.ListAPIView):
         "-created_at",
     ]
 
+    @cache_response(
+        timeout=60 * 10,  # 10 mins
+        key_prefix="stage_deleted_list",
+        models=[Stage, EduSystem, User],
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class StageRetrieveView(generics.RetrieveAPIView):
     serializer_class = StageSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a5_stage.view_stage"
     lookup_field = "id"
@@ -103,94 +121,52 @@ class StageRetrieveView(generics.RetrieveAPIView):
 
     def get_object(self):
         stage_id = self.request.query_params.get("stage_id")
-        cache_key = f"stage_detail_{stage_id}"
-        return get_or_set_cache(
-            cache_key,
-            lambda: get_object_or_404(self.get_queryset(), id=stage_id),
+        return get_object_or_404(self.get_queryset(), id=stage_id)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Cache the serialized payload; invalidated from Stage signals
+        stage_id = request.query_params.get("stage_id")
+        data = get_or_set_detail_cache(
+            "stage",
+            stage_id,
+            lambda: self.get_serializer(self.get_object()).data,
             timeout=300,
         )
+        return Response(data)
 
 
-class StageDeleteTemporaryView(generics.UpdateAPIView):
+class StageDeleteTemporaryView(BulkStateChangeMixin, generics.UpdateAPIView):
     serializer_class = StageDeletedSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a5_stage.delete_stage"
-
-    def update(self, request, *args, **kwargs):
-        stage_ids = request.data.get("stage_id", [])
-        partial = kwargs.pop("partial", False)
-        is_deleted = request.data.get("is_deleted")
-
-        if is_deleted == False:
-            return Response(
-                {"detail": _("These stages are not deleted")},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        for stage_id in stage_ids:
-            instance = get_object_or_404(Stage, id=stage_id)
-            if instance.is_deleted:
-                return Response(
-                    {
-                        "detail": _(
-                            "Stage with ID {} is already temp deleted".format(stage_id)
-                        )
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            serializer = self.get_serializer(
-                instance, data=request.data, partial=partial
-            )
-            serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
-            clear_cache_key(f"stage_detail_{stage_id}")
-
-        return Response(
-            {"detail": _("Stage temp deleted successfully")},
-            status=status.HTTP_200_OK,
-        )
+    model = Stage
+    ids_param = "stage_id"
+    state_value = True
+    detail_cache_prefix = "stage"
+    conflicting_state_message = _("These stages are not deleted")
+    already_in_state_message = _("Stage with ID {} is already temp deleted")
+    success_message = _("Stage temp deleted successfully")
 
 
-class StageRestoreView(generics.RetrieveUpdateAPIView):
+class StageRestoreView(BulkStateChangeMixin, generics.RetrieveUpdateAPIView):
 
     serializer_class = StageDeletedSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a5_stage.delete_stage"
-
-    def update(self, request, *args, **kwargs):
-        stage_ids = request.data.get("stage_id", [])
-        partial = kwargs.pop("partial", False)
-        is_deleted = request.data.get("is_deleted")
-
-        if is_deleted == True:
-            return Response(
-                {"detail": _("Stages are already deleted")},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        for stage_id in stage_ids:
-            instance = get_object_or_404(Stage, id=stage_id)
-            if instance.is_deleted == False:
-                return Response(
-                    {"detail": _("Stages with ID {} is not deleted".format(stage_id))},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            serializer = self.get_serializer(
-                instance, data=request.data, partial=partial
-            )
-            serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
-            clear_cache_key(f"stage_detail_{stage_id}")
-
-        return Response(
-            {"detail": _("Stages restored successfully")},
-            status=status.HTTP_200_OK,
-        )
+    model = Stage
+    ids_param = "stage_id"
+    state_value = False
+    detail_cache_prefix = "stage"
+    conflicting_state_message = _("Stages are already deleted")
+    already_in_state_message = _("Stages with ID {} is not deleted")
+    success_message = _("Stages restored successfully")
 
 
 class StageUpdateView(generics.UpdateAPIView):
     serializer_class = StageSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a5_stage.change_stage"
     lookup_field = "id"
@@ -206,7 +182,6 @@ class StageUpdateView(generics.UpdateAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-        clear_cache_key(f"stage_detail_{instance.id}")
 
         return Response(
             {"detail": _("Stage Updated successfully")},
@@ -215,7 +190,7 @@ class StageUpdateView(generics.UpdateAPIView):
 
 
 class StageDeleteView(generics.DestroyAPIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "a5_stage.delete_stage"
     import uuid
@@ -233,8 +208,6 @@ class StageDeleteView(generics.DestroyAPIView):
 
         # Check if each UUID is valid
         for uid in stage_ids:
-            clear_cache_key(f"stage_detail_{uid}")
-
             try:
                 uuid.UUID(uid.strip())
             except ValueError:
@@ -257,6 +230,30 @@ class StageDeleteView(generics.DestroyAPIView):
 
 class StageDialogView(generics.ListAPIView):
     serializer_class = StageDialogSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated]
     queryset = Stage.objects.filter(is_deleted=False).order_by("-created_at")
+
+
+class StageExportView(StreamingExportView):
+    queryset = Stage.objects.filter(is_deleted=False)
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
+    permission_codename = "a5_stage.view_stage"
+    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filterset_class = StageFilter
+    search_fields = [
+        "name",
+        "name_ar",
+    ]
+    export_fields = [
+        "id",
+        "name",
+        "name_ar",
+        "description",
+        "edu_system__name",
+        "is_active",
+        "created_at",
+        "updated_at",
+    ]
+    export_filename = "stages"
@@ -0,0 +1,20 @@
+from django.db.models import Aggregate, JSONField
+
+
+class JSONArrayAgg(Aggregate):
+    """
+    Aggregate a column into a JSON array, decoded to a Python list.
+    Unlike GROUP_CONCAT it isn't cut off at group_concat_max_len on MySQL
+    and values may contain any separator.
+    """
+
+    function = "JSON_ARRAYAGG"
+    output_field = JSONField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function="JSON_GROUP_ARRAY", **extra_context
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function="JSON_AGG", **extra_context)
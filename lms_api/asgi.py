@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lms_api.settings')
 
 application = get_asgi_application()
+
+# Requeue the user imports a previous server process left unfinished
+from user.importers import recover_import_jobs  # noqa: E402
+
+recover_import_jobs()
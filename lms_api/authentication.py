@@ -0,0 +1,128 @@
+"""
+Stateless JWT authentication.
+
+Access tokens issued by issue_access_token() carry the user's type and
+account flags (AUTH_CLAIMS) and the user's auth version stamp.
+StatelessJWTAuthentication builds request.user from those claims without a
+query while the stamp is current. Every write to the user row moves the
+stamp on; after that the row's flags are read from the database once and
+cached under the new stamp. Fields the token doesn't carry are deferred, so
+reading them still works (loaded on access).
+
+Tokens without the stamp (issued before it existed) are authenticated by
+loading the user, as JWTAuthentication does.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from lms_api.cache_versions import bump_version, get_version
+
+User = get_user_model()
+
+AUTH_CLAIMS = ("user_type", "is_active", "is_deleted", "is_staff", "is_superuser")
+AUTH_VERSION_CLAIM = "auth_version"
+USER_AUTH_VERSION_KEY = "user_auth_version_{}"
+USER_AUTH_STATE_KEY = "user_auth_state_{}"
+USER_AUTH_STATE_TIMEOUT = 60 * 60
+
+
+def get_user_auth_version(user_id):
+    return get_version(USER_AUTH_VERSION_KEY.format(user_id))
+
+
+def bump_user_auth_versions(*user_ids):
+    """
+    Make the claims of the users' access tokens stale. Called on save/delete;
+    call it explicitly after QuerySet.update() on AUTH_CLAIMS fields.
+    """
+    for user_id in user_ids:
+        bump_version(USER_AUTH_VERSION_KEY.format(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_auth_state(sender, instance, **kwargs):
+    # After commit, so the state reloaded for the new stamp is the new one
+    user_id = instance.pk
+    transaction.on_commit(lambda: bump_user_auth_versions(user_id))
+
+
+def issue_access_token(user, auth_version=None):
+    """
+    Return an access token for ``user`` carrying its auth claims.
+
+    ``auth_version`` must be the user's stamp as read *before* ``user`` was
+    loaded: a write committed in between then leaves the token stale instead
+    of stamping old claims as current. Without it the token is authenticated
+    by loading the user.
+    """
+    token = AccessToken.for_user(user)
+    for claim in AUTH_CLAIMS:
+        token[claim] = getattr(user, claim)
+    if auth_version is not None:
+        token[AUTH_VERSION_CLAIM] = auth_version
+    return token
+
+
+def _build_user(user_id, state):
+    known = {User._meta.pk.attname: User._meta.pk.to_python(user_id), **state}
+    # from_db() expects the values in field order; the rest is deferred
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in known]
+    return User.from_db(
+        router.db_for_read(User), fields, [known[name] for name in fields]
+    )
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that trusts the token's auth claims while the user's
+    auth version stamp is unchanged, so authenticating costs no query.
+    """
+
+    def get_user(self, validated_token):
+        if (
+            AUTH_VERSION_CLAIM not in validated_token
+            or api_settings.USER_ID_CLAIM not in validated_token
+            or getattr(api_settings, "CHECK_REVOKE_TOKEN", False)
+        ):
+            user = super().get_user(validated_token)
+            if user.is_deleted:
+                raise AuthenticationFailed(_("User is deleted"), code="user_deleted")
+            return user
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        version = get_user_auth_version(user_id)
+        if validated_token[AUTH_VERSION_CLAIM] == version:
+            state = {claim: validated_token.get(claim) for claim in AUTH_CLAIMS}
+        else:
+            state = self.get_current_state(user_id, version)
+
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not state["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if state["is_deleted"]:
+            raise AuthenticationFailed(_("User is deleted"), code="user_deleted")
+        return _build_user(user_id, state)
+
+    def get_current_state(self, user_id, version):
+        key = USER_AUTH_STATE_KEY.format(user_id)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        state = (
+            User.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+            .values(*AUTH_CLAIMS)
+            .first()
+        )
+        cache.set(key, (version, state), USER_AUTH_STATE_TIMEOUT)
+        return state
@@ -0,0 +1,183 @@
+"""
+Set-based state changes (temp delete, restore) and hard deletes over many
+rows.
+
+All submitted ids are checked with one query and changed with one
+``UPDATE ... WHERE id IN (...)`` in a single transaction, so a batch is
+applied entirely or not at all. ``.update()`` sends no signals, so the
+model's caches are invalidated once afterwards.
+
+Hard deletes resolve every id up front and then delete in chunks, one
+transaction and one cascade collector pass per chunk.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from lms_api.utils import (
+    batched_cache_generation_bumps,
+    bump_cache_generation,
+    clear_detail_cache,
+)
+
+# Ids per query when resolving, deleting or writing rows in bulk
+BULK_CHUNK_SIZE = 1000
+
+
+def resolve_ids(model, ids):
+    """
+    Return ``(pks, missing)``: the stored primary keys of ``ids`` that
+    exist, and the submitted ids that are malformed or don't exist.
+    One query per BULK_CHUNK_SIZE ids.
+    """
+    if isinstance(ids, (str, int)):
+        ids = [ids]
+    pk_field = model._meta.pk
+    wanted = {}
+    missing = []
+    for submitted in ids:
+        try:
+            wanted.setdefault(pk_field.to_python(submitted), submitted)
+        except ValidationError:
+            missing.append(submitted)
+    keys = list(wanted)
+    found = set()
+    for start in range(0, len(keys), BULK_CHUNK_SIZE):
+        found.update(
+            model._default_manager.filter(
+                pk__in=keys[start : start + BULK_CHUNK_SIZE]
+            ).values_list("pk", flat=True)
+        )
+    missing.extend(submitted for pk, submitted in wanted.items() if pk not in found)
+    return [pk for pk in keys if pk in found], missing
+
+
+def bulk_delete(queryset, pks, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Delete the rows of ``queryset`` with the given primary keys, cascades
+    included. Returns the number of ``queryset.model`` rows deleted.
+    """
+    model = queryset.model
+    deleted = 0
+    # post_delete fires per row; bump the list caches once per model instead
+    with batched_cache_generation_bumps():
+        for start in range(0, len(pks), chunk_size):
+            with transaction.atomic(using=queryset.db):
+                _total, per_model = queryset.filter(
+                    pk__in=pks[start : start + chunk_size]
+                ).delete()
+            deleted += per_model.get(model._meta.label, 0)
+    return deleted
+
+
+class BulkStateChangeMixin:
+    """
+    Update view that sets ``state_field`` to ``state_value`` on every row
+    whose id is listed in ``request.data[ids_param]``.
+
+    Subclasses set ``model``, ``ids_param``, ``state_value``,
+    ``detail_cache_prefix`` (as given to register_detail_cache) and the
+    messages; ``*_message`` strings with ``{}`` get the offending id.
+    """
+
+    model = None
+    ids_param = None
+    state_field = "is_deleted"
+    state_value = True
+    detail_cache_prefix = None
+    # Returned when the request body asks for the opposite state
+    conflicting_state_message = None
+    already_in_state_message = None
+    success_message = None
+
+    def get_bulk_ids(self, request):
+        ids = request.data.get(self.ids_param, [])
+        if isinstance(ids, (str, int)):
+            ids = [ids]
+        pk_field = self.model._meta.pk
+        try:
+            # Same ids in the same order, as the stored type
+            return list(dict.fromkeys(pk_field.to_python(pk) for pk in ids))
+        except ValidationError:
+            raise Http404
+
+    def update(self, request, *args, **kwargs):
+        requested = request.data.get(self.state_field)
+        if requested is not None and requested == (not self.state_value):
+            return Response(
+                {"detail": self.conflicting_state_message},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        ids = self.get_bulk_ids(request)
+
+        with transaction.atomic():
+            current = dict(
+                self.model._default_manager.select_for_update()
+                .filter(pk__in=ids)
+                .values_list("pk", self.state_field)
+            )
+            for pk in ids:
+                if pk not in current:
+                    raise Http404
+                if current[pk] == self.state_value:
+                    return Response(
+                        {"detail": str(self.already_in_state_message).format(pk)},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+            updates = {self.state_field: self.state_value}
+            if any(f.name == "updated_at" for f in self.model._meta.concrete_fields):
+                # auto_now is only applied by save()
+                updates["updated_at"] = timezone.now()
+            if ids:
+                self.model._default_manager.filter(pk__in=ids).update(**updates)
+
+        if ids:
+            self.bulk_state_changed(ids)
+        return Response({"detail": self.success_message}, status=status.HTTP_200_OK)
+
+    def bulk_state_changed(self, ids):
+        """
+        Invalidate what the signals skipped by .update() would have.
+        """
+        bump_cache_generation(self.model)
+        if self.detail_cache_prefix:
+            clear_detail_cache(self.detail_cache_prefix, *ids)
+
+
+class BulkDeleteMixin:
+    """
+    Destroy view that permanently deletes every row whose id is listed in
+    ``request.data[ids_param]``. Nothing is deleted unless all ids exist;
+    otherwise the missing ones are reported together.
+    """
+
+    model = None
+    ids_param = None
+    # Returned when no ids are submitted; None accepts an empty list
+    no_ids_message = None
+    missing_message = None
+    success_message = None
+
+    def get_bulk_delete_queryset(self):
+        return self.model._default_manager.all()
+
+    def delete(self, request, *args, **kwargs):
+        ids = request.data.get(self.ids_param, [])
+        if not ids and self.no_ids_message is not None:
+            return Response(
+                {"detail": self.no_ids_message}, status=status.HTTP_400_BAD_REQUEST
+            )
+        pks, missing = resolve_ids(self.model, ids)
+        if missing:
+            return Response(
+                {"detail": self.missing_message, "missing_ids": missing},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        bulk_delete(self.get_bulk_delete_queryset(), pks)
+        return Response(
+            {"detail": self.success_message}, status=status.HTTP_204_NO_CONTENT
+        )
@@ -0,0 +1,245 @@
+"""
+Two-tier cache backend: a bounded in-process LRU in front of a shared cache.
+
+Every value written through this backend gets a version stamp stored next to
+it in the shared tier (``<key>:stamp``). Local copies remember the stamp they
+were read with and are re-validated against the shared stamp at most once per
+STAMP_CHECK_INTERVAL seconds, so a write or delete in one worker is seen by
+every other worker within that interval while most reads never leave the
+process.
+
+The shared tier must make add() and incr() atomic for every process using
+it: version stamps (permission snapshots, cache generations, token auth
+versions) are counters moved with incr(), and shared locks are taken with
+add(). Redis and memcached do; FileBasedCache and DatabaseCache don't (their
+add()/incr() are a read followed by a write, and incr() even resets the
+timeout), so they are refused. LocMemCache is atomic within one process
+only, which makes it fit for a single worker process and for tests.
+
+Example:
+
+    CACHES = {
+        "default": {
+            "BACKEND": "lms_api.cache_backends.TwoTierCache",
+            "OPTIONS": {
+                "LOCAL_MAX_ENTRIES": 1000,
+                "LOCAL_TIMEOUT": 60,
+                "STAMP_CHECK_INTERVAL": 1,
+                "SHARED": {
+                    "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                    "LOCATION": "redis://127.0.0.1:6379/0",
+                },
+            },
+        }
+    }
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+# Shared tiers whose add() and incr() are atomic across their clients
+ATOMIC_SHARED_BACKENDS = (
+    "django.core.cache.backends.redis.RedisCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+    # Within one process only
+    "django.core.cache.backends.locmem.LocMemCache",
+)
+
+
+def _new_stamp():
+    return uuid.uuid4().hex
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        shared = options.get("SHARED", {})
+        shared_backend = import_string(
+            shared.get("BACKEND", "django.core.cache.backends.locmem.LocMemCache")
+        )
+        if not issubclass(
+            shared_backend, tuple(import_string(path) for path in ATOMIC_SHARED_BACKENDS)
+        ):
+            raise ImproperlyConfigured(
+                "TwoTierCache needs a shared backend with atomic add() and "
+                "incr(), such as Redis or memcached; got %s."
+                % shared_backend.__qualname__
+            )
+        self._shared = shared_backend(shared.get("LOCATION", location), shared)
+        self._local_max_entries = options.get("LOCAL_MAX_ENTRIES", 1000)
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 60)
+        self._stamp_check_interval = options.get("STAMP_CHECK_INTERVAL", 1)
+        # local key -> [value, expires_at, stamp, checked_at]
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Local tier
+
+    def _local_get(self, key, now):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry
+
+    def _local_set(self, key, value, timeout, stamp, now):
+        ttl = self._local_timeout
+        if timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0 or stamp is None:
+            self._local_delete(key)
+            return
+        with self._lock:
+            self._local[key] = [value, now + ttl, stamp, now]
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    def _resolve_timeout(self, timeout):
+        # Relative timeout in seconds, as the shared backend expects it
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    @staticmethod
+    def _stamp_key(key):
+        return f"{key}:stamp"
+
+    def _is_fresh(self, entry, now):
+        return now - entry[3] < self._stamp_check_interval
+
+    def _write_stamp(self, key, timeout, version):
+        stamp = _new_stamp()
+        self._shared.set(self._stamp_key(key), stamp, timeout, version=version)
+        return stamp
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        now = time.monotonic()
+        result = {}
+        to_check = {}
+        to_fetch = []
+        for key in keys:
+            local_key = self.make_and_validate_key(key, version=version)
+            entry = self._local_get(local_key, now)
+            if entry is None:
+                to_fetch.append(key)
+            elif self._is_fresh(entry, now):
+                result[key] = entry[0]
+            else:
+                to_check[key] = entry
+
+        if not to_check and not to_fetch:
+            return result
+
+        # Stamps are read before values (and written after them), so a value
+        # is never cached locally under a stamp newer than itself.
+        shared_keys = [self._stamp_key(key) for key in to_check]
+        for key in to_fetch:
+            shared_keys += [self._stamp_key(key), key]
+        shared = self._shared.get_many(shared_keys, version=version)
+
+        for key, entry in to_check.items():
+            local_key = self.make_and_validate_key(key, version=version)
+            if shared.get(self._stamp_key(key)) == entry[2]:
+                entry[3] = now
+                result[key] = entry[0]
+            else:
+                # Changed or deleted elsewhere; read it again from the shared tier
+                self._local_delete(local_key)
+                stamp = shared.get(self._stamp_key(key))
+                value = self._shared.get(key, self, version=version)
+                if value is not self:
+                    result[key] = value
+                    self._local_set(local_key, value, self._local_timeout, stamp, now)
+        for key in to_fetch:
+            if key in shared:
+                result[key] = shared[key]
+                self._local_set(
+                    self.make_and_validate_key(key, version=version),
+                    shared[key],
+                    self._local_timeout,
+                    shared.get(self._stamp_key(key)),
+                    now,
+                )
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._resolve_timeout(timeout)
+        self._shared.set(key, value, timeout, version=version)
+        stamp = self._write_stamp(key, timeout, version)
+        local_key = self.make_and_validate_key(key, version=version)
+        self._local_set(local_key, value, timeout, stamp, time.monotonic())
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version=version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._resolve_timeout(timeout)
+        if not self._shared.add(key, value, timeout, version=version):
+            return False
+        stamp = self._write_stamp(key, timeout, version)
+        local_key = self.make_and_validate_key(key, version=version)
+        self._local_set(local_key, value, timeout, stamp, time.monotonic())
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._resolve_timeout(timeout)
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        touched = self._shared.touch(key, timeout, version=version)
+        self._shared.touch(self._stamp_key(key), timeout, version=version)
+        return touched
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        deleted = self._shared.delete(key, version=version)
+        self._shared.delete(self._stamp_key(key), version=version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        self._shared.delete_many(
+            keys + [self._stamp_key(key) for key in keys], version=version
+        )
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def incr(self, key, delta=1, version=None):
+        # Counters live in the shared tier; the local copy is only refreshed
+        # through the stamp like any other value.
+        value = self._shared.incr(key, delta, version=version)
+        local_key = self.make_and_validate_key(key, version=version)
+        self._local_delete(local_key)
+        self._write_stamp(key, None, version)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self._shared.clear()
+
+    def close(self, **kwargs):
+        self._shared.close(**kwargs)
@@ -0,0 +1,73 @@
+"""
+Cache key building for cached views.
+
+A cached view declares what its response varies on; the key is built from
+the request path plus those parts only, so equivalent requests share an
+entry and requests that may see different data never do.
+"""
+
+import hashlib
+from urllib.parse import urlencode
+
+from django.utils.translation import get_language
+
+from lms_api.custom_permissions import get_permission_snapshot
+
+# Active language (i18n_patterns prefix or Accept-Language)
+VARY_LANGUAGE = "language"
+# Query parameters, in normalized order
+VARY_QUERY = "query"
+# The caller's resolved permission set; users with equal permissions share entries
+VARY_PERMISSIONS = "permissions"
+# The caller's identity; for responses that are specific to one user
+VARY_USER = "user"
+
+DEFAULT_VARY = (VARY_LANGUAGE, VARY_QUERY)
+
+
+def normalized_query(request):
+    params = sorted(
+        (key, sorted(values)) for key, values in request.GET.lists()
+    )
+    return urlencode(params, doseq=True)
+
+
+def permission_fingerprint(user):
+    if not user.is_authenticated:
+        return "anonymous"
+    if user.is_active and user.is_superuser:
+        return "superuser"
+    permissions, group_codenames = get_permission_snapshot(user)
+    content = "\n".join(sorted(permissions)) + "|" + "\n".join(sorted(group_codenames))
+    if not user.is_active:
+        content = "inactive|" + content
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+def user_fingerprint(user):
+    if not user.is_authenticated:
+        return "anonymous"
+    return str(user.pk)
+
+
+VARY_BUILDERS = {
+    VARY_LANGUAGE: lambda request: get_language() or "",
+    VARY_QUERY: normalized_query,
+    VARY_PERMISSIONS: lambda request: permission_fingerprint(request.user),
+    VARY_USER: lambda request: user_fingerprint(request.user),
+}
+
+
+def build_cache_key(key_prefix, request, vary=DEFAULT_VARY, extra=()):
+    """
+    Build the cache key for ``request``.
+    :param key_prefix: Human readable prefix, kept as-is in the key
+    :param vary: Names from VARY_BUILDERS the response depends on
+    :param extra: Additional values to mix into the key (e.g. generations)
+    """
+    parts = [request.path]
+    for name in vary:
+        parts.append(f"{name}={VARY_BUILDERS[name](request)}")
+    parts.extend(str(value) for value in extra)
+    digest = hashlib.md5("\n".join(parts).encode()).hexdigest()
+    return f"{key_prefix}:{digest}"
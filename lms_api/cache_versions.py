@@ -0,0 +1,47 @@
+"""
+Version stamps kept in the shared cache.
+
+A stamp is an integer that only ever grows. Cached data records the stamp it
+was computed against and is treated as stale once the stamp has moved on, so
+invalidating any amount of data is a single ``incr``.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def _initial_version():
+    # Seed new stamps from the clock so a stamp that was evicted from the
+    # cache never comes back with a value older entries were computed against.
+    return int(time.time() * 1000)
+
+
+def get_versions(keys):
+    """
+    Return a ``{key: version}`` dict for the given stamp keys in one cache
+    round trip, creating any stamp that does not exist yet.
+    """
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _initial_version(), None)
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def get_version(key):
+    return get_versions([key])[key]
+
+
+def bump_version(key):
+    """
+    Move a stamp forward, invalidating everything computed against it.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, None)
+        return version
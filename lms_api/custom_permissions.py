@@ -1,5 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models import BooleanField, Value
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+
 from rest_framework.permissions import BasePermission
 
+from lms_api.cache_versions import bump_version, get_versions
+
+User = get_user_model()
+
+# Bumped whenever a change can affect many users at once (group permissions,
+# group deletion, bulk membership changes made from the group side).
+PERMISSIONS_VERSION_KEY = "permissions_version"
+# Bumped whenever a single user's groups or direct permissions change.
+USER_PERMISSIONS_VERSION_KEY = "user_permissions_version_{}"
+PERMISSIONS_SNAPSHOT_KEY = "user_permissions_snapshot_{}"
+PERMISSIONS_SNAPSHOT_TIMEOUT = 60 * 60
+
+
+def _load_permission_snapshot(user):
+    # A single round trip: direct permissions UNION group permissions, with a
+    # flag telling which side each row came from.
+    direct = (
+        Permission.objects.filter(user=user)
+        .values_list(
+            "content_type__app_label",
+            "codename",
+            Value(False, output_field=BooleanField()),
+        )
+        .order_by()
+    )
+    via_group = (
+        Permission.objects.filter(group__user=user)
+        .values_list(
+            "content_type__app_label",
+            "codename",
+            Value(True, output_field=BooleanField()),
+        )
+        .order_by()
+    )
+
+    permissions = set()
+    group_codenames = set()
+    for app_label, codename, from_group in direct.union(via_group):
+        permissions.add(f"{app_label}.{codename}")
+        if from_group:
+            group_codenames.add(codename)
+    return frozenset(permissions), frozenset(group_codenames)
+
+
+def get_permission_snapshot(user):
+    """
+    Return ``(permissions, group_codenames)`` for ``user``.
+
+    ``permissions`` holds every ``"app_label.codename"`` the user has directly
+    or through a group (what ``user.has_perm`` checks against) and
+    ``group_codenames`` holds the bare codenames granted through groups.
+    The snapshot lives in the shared cache, tagged with the permission version
+    stamps, and is memoized on the user object for the rest of the request.
+    """
+    snapshot = getattr(user, "_permission_snapshot", None)
+    if snapshot is not None:
+        return snapshot
+
+    user_version_key = USER_PERMISSIONS_VERSION_KEY.format(user.pk)
+    snapshot_key = PERMISSIONS_SNAPSHOT_KEY.format(user.pk)
+    cached = cache.get_many([PERMISSIONS_VERSION_KEY, user_version_key, snapshot_key])
+    if PERMISSIONS_VERSION_KEY not in cached or user_version_key not in cached:
+        cached.update(get_versions([PERMISSIONS_VERSION_KEY, user_version_key]))
+    versions = (cached[PERMISSIONS_VERSION_KEY], cached[user_version_key])
+
+    entry = cached.get(snapshot_key)
+    if entry is not None and entry[0] == versions:
+        snapshot = entry[1]
+    else:
+        snapshot = _load_permission_snapshot(user)
+        cache.set(snapshot_key, (versions, snapshot), PERMISSIONS_SNAPSHOT_TIMEOUT)
+
+    user._permission_snapshot = snapshot
+    return snapshot
+
+
 class HasPermissionOrInGroupWithPermission(BasePermission):
     """
     Custom permission to check if the user has the required permission or
@@ -8,20 +91,49 @@ class HasPermissionOrInGroupWithPermission(BasePermission):
 
     def has_permission(self, request, view):
         # Get the required permission codename from the view
-        permission_codename = getattr(view, 'permission_codename', None)
+        permission_codename = getattr(view, "permission_codename", None)
 
         if permission_codename is None:
             # If no permission_codename is set on the view, deny permission
             return False
 
+        user = request.user
+        if not user.is_authenticated:
+            return False
+
+        # Active superusers have every permission, as with user.has_perm()
+        if user.is_active and user.is_superuser:
+            return True
+
+        permissions, group_codenames = get_permission_snapshot(user)
+
         # 1. Check if the user has the permission directly
-        if request.user.has_perm(permission_codename):
+        if user.is_active and permission_codename in permissions:
             return True
 
         # 2. Check if the user belongs to a group with the required permission
-        for group in request.user.groups.all():
-            if group.permissions.filter(codename=permission_codename).exists():
-                return True
+        return permission_codename in group_codenames
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permissions(sender, instance, action, reverse, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # Changed from the group/permission side: any number of users.
+        bump_version(PERMISSIONS_VERSION_KEY)
+    else:
+        bump_version(USER_PERMISSIONS_VERSION_KEY.format(instance.pk))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_version(PERMISSIONS_VERSION_KEY)
+
 
-        # If neither condition is met, deny permission
-        return False
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_deleted_permissions(sender, **kwargs):
+    bump_version(PERMISSIONS_VERSION_KEY)
@@ -0,0 +1,101 @@
+"""
+Streaming exports of querysets as CSV or NDJSON.
+
+Rows are read with values() in primary-key ordered batches (keyset, not
+OFFSET) and written to a StreamingHttpResponse as they arrive, so memory
+stays flat however many rows are exported.
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import generics, status
+from rest_framework.response import Response
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def iter_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield ``queryset.values(*fields)`` rows, ``chunk_size`` rows per query.
+    """
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(batch.values("pk", *fields)[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1]["pk"]
+        for row in rows:
+            if "pk" not in fields:
+                del row["pk"]
+            yield row
+        if len(rows) < chunk_size:
+            return
+
+
+class _Echo:
+    # csv.writer only needs write(); hand each line straight back
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row[field] for field in fields])
+
+
+def ndjson_lines(rows, fields):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+EXPORT_FORMATS = {
+    "csv": (csv_lines, "text/csv"),
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+}
+
+
+def stream_export(queryset, fields, filename, export_format="csv"):
+    """
+    Return a StreamingHttpResponse with ``queryset`` as an attachment.
+    """
+    write_lines, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        write_lines(iter_rows(queryset, fields), fields),
+        content_type=f"{content_type}; charset=utf-8",
+    )
+    response["Content-Disposition"] = (
+        f"attachment; filename={filename}.{export_format}"
+    )
+    return response
+
+
+class StreamingExportView(generics.GenericAPIView):
+    """
+    Export the view's filtered queryset. Subclasses set ``export_fields``
+    (values() lookups, also used as the header) and ``export_filename``.
+    The format is picked with ``?export_format=csv|ndjson``.
+    """
+
+    export_fields = []
+    export_filename = "export"
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get("export_format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"detail": _("Unsupported export format.")},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        return stream_export(
+            queryset, self.export_fields, self.export_filename, export_format
+        )
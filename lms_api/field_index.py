@@ -0,0 +1,177 @@
+"""
+Index of the project's unique/indexed fields, for existence checks.
+
+The index maps a field name to the concrete models of this project's own
+apps (not Django's or third parties') where that field is a unique or
+indexed column, so a lookup never scans a table. It is built once per
+process, on first use.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import CharField, IntegerField, TextField, Value
+
+from lms_api.utils import (
+    get_cache_generations,
+    get_or_set_cache,
+    is_cache_generation_tracked,
+)
+
+EXISTENCE_CACHE_TIMEOUT = 30
+# Values probed per UNION query on text columns (SQLite allows 500 terms)
+COLLATED_LOOKUP_CHUNK_SIZE = 100
+
+
+def _is_project_app(app_config):
+    # A virtualenv may live inside the project directory too
+    base_dir = os.path.join(str(settings.BASE_DIR), "")
+    path = os.path.join(app_config.path, "")
+    return path.startswith(base_dir) and "site-packages" not in path
+
+
+@lru_cache(maxsize=None)
+def get_field_index():
+    """
+    Return ``{field_name: ((model, field), ...)}`` for the unique/indexed
+    concrete fields of the project's models.
+    """
+    index = {}
+    for app_config in apps.get_app_configs():
+        if not _is_project_app(app_config):
+            continue
+        for model in app_config.get_models():
+            if model._meta.proxy or not model._meta.managed:
+                continue
+            for field in model._meta.concrete_fields:
+                if field.is_relation:
+                    continue
+                if field.primary_key or field.unique or field.db_index:
+                    index.setdefault(field.name, []).append((model, field))
+    return {name: tuple(entries) for name, entries in index.items()}
+
+
+def _lookup_queryset(model, field, value):
+    try:
+        value = field.to_python(value)
+    except (ValidationError, ValueError, TypeError):
+        # Can't be stored in this column, so it can't exist there either
+        return None
+    return (
+        model._default_manager.filter(**{field.attname: value})
+        .order_by()
+        .values_list(Value(model.__name__, output_field=CharField()), flat=True)
+    )
+
+
+def find_existing_models(field_name, value):
+    """
+    Return the sorted names of the models where ``field_name`` equals
+    ``value``. All models are checked in one UNION query, and answers are
+    cached briefly (writes to those models invalidate them) when every
+    model's cache generation is tracked.
+    """
+    entries = get_field_index().get(field_name, ())
+    if not entries:
+        return []
+
+    def lookup():
+        querysets = [
+            qs
+            for qs in (_lookup_queryset(model, field, value) for model, field in entries)
+            if qs is not None
+        ]
+        if not querysets:
+            return []
+        # UNION (not ALL) leaves at most one row per model
+        return sorted(querysets[0].union(*querysets[1:]))
+
+    models = [model for model, _ in entries]
+    if not is_cache_generation_tracked(models):
+        return lookup()
+    digest = hashlib.md5(str(value).encode()).hexdigest()
+    generations = ".".join(str(g) for g in get_cache_generations(models))
+    key = f"field_exists:{field_name}:{digest}:{generations}"
+
+    return get_or_set_cache(key, lookup, timeout=EXISTENCE_CACHE_TIMEOUT)
+
+
+def _is_collated(field):
+    # Text is compared with the column's collation, which may ignore case,
+    # accents or trailing spaces (MySQL's defaults do); only the database
+    # can tell which of the values asked for a stored value matches
+    return isinstance(field, (CharField, TextField))
+
+
+def _exact_matches(model, field, keys, chunk_size):
+    # Stored values compare like the Python values they are read back as
+    matched = set()
+    for start in range(0, len(keys), chunk_size):
+        matched.update(
+            model._default_manager.filter(
+                **{f"{field.attname}__in": keys[start : start + chunk_size]}
+            )
+            .order_by()
+            .values_list(field.attname, flat=True)
+            .distinct()
+        )
+    return matched
+
+
+def _collated_matches(model, field, keys):
+    # One ``field = value`` lookup per key, tagged with the key's position,
+    # so the database matches each key as the single-field check does
+    matched = set()
+    for start in range(0, len(keys), COLLATED_LOOKUP_CHUNK_SIZE):
+        chunk = keys[start : start + COLLATED_LOOKUP_CHUNK_SIZE]
+        querysets = [
+            model._default_manager.filter(**{field.attname: key})
+            .order_by()
+            .values_list(Value(position, output_field=IntegerField()), flat=True)
+            for position, key in enumerate(chunk)
+        ]
+        matched.update(
+            chunk[position] for position in querysets[0].union(*querysets[1:])
+        )
+    return matched
+
+
+def find_existing_values(pairs, chunk_size=1000):
+    """
+    Batched find_existing_models: return ``{(field_name, value): [model
+    names]}`` for every ``(field_name, value)`` pair. Each (model, field)
+    costs one indexed ``IN`` query per ``chunk_size`` values, however many
+    pairs ask about it. Text columns are matched by the database instead,
+    one UNION query per COLLATED_LOOKUP_CHUNK_SIZE values, so a
+    case-insensitive collation finds what find_existing_models() finds.
+    """
+    index = get_field_index()
+    values_by_field = {}
+    for field_name, value in pairs:
+        values_by_field.setdefault(field_name, set()).add(value)
+
+    found = {(field_name, value): [] for field_name, value in pairs}
+    for field_name, values in values_by_field.items():
+        for model, field in index.get(field_name, ()):
+            # Stored (converted) value -> the values asked for
+            wanted = {}
+            for value in values:
+                try:
+                    wanted.setdefault(field.to_python(value), []).append(value)
+                except (ValidationError, ValueError, TypeError):
+                    continue
+            keys = list(wanted)
+            if not keys:
+                continue
+            if _is_collated(field):
+                matched = _collated_matches(model, field, keys)
+            else:
+                matched = _exact_matches(model, field, keys, chunk_size)
+            for key in matched:
+                for value in wanted.get(key, ()):
+                    found[(field_name, value)].append(model.__name__)
+    return {pair: sorted(models) for pair, models in found.items()}
@@ -1,15 +1,261 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import hashlib
+import json
+
+from django.apps import apps
+from django.core.exceptions import (
+    EmptyResultSet,
+    FieldDoesNotExist,
+    FullResultSet,
+    ValidationError,
+)
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from lms_api.utils import (
+    get_cache_generations,
+    get_or_set_cache,
+    is_cache_generation_tracked,
+)
+
+COUNT_CACHE_TIMEOUT = 60 * 10  # 10 mins
+# Unfiltered tables at least this big are counted from InnoDB statistics
+ESTIMATE_COUNT_THRESHOLD = 100000
+
+
+def _query_models(queryset):
+    # Every model whose table the query reads, so a write to any of them
+    # (not only queryset.model) invalidates the count
+    tables = {alias.table_name for alias in queryset.query.alias_map.values()}
+    tables.add(queryset.model._meta.db_table)
+    return sorted(
+        (model for model in apps.get_models() if model._meta.db_table in tables),
+        key=lambda model: model._meta.label_lower,
+    )
+
+
+def _estimated_count(queryset):
+    """
+    Row estimate from InnoDB table statistics, or None when the query is
+    filtered or the database isn't MySQL.
+    """
+    query = queryset.query
+    connection = connections[queryset.db]
+    if connection.vendor != "mysql" or query.where or query.distinct:
+        return None
+    if len(query.alias_map) > 1 or query.low_mark or query.high_mark:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+def get_cached_count(queryset):
+    """
+    Return ``(count, exact)`` for ``queryset``. Counts are cached per model
+    and filter (the compiled SQL) and invalidated by the cache generations
+    of every table involved; queries over a table whose generation isn't
+    tracked are counted every time. Big unfiltered InnoDB tables are estimated from
+    table statistics instead of scanned.
+    """
+    models = _query_models(queryset)
+    if not is_cache_generation_tracked(models):
+        # Writes to an untracked table wouldn't invalidate the count
+        return queryset.count(), True
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        # .none() or an empty __in: nothing to count
+        return 0, True
+    except FullResultSet:
+        return queryset.count(), True
+    fingerprint = hashlib.md5(
+        f"{queryset.db}|{sql}|{params!r}".encode()
+    ).hexdigest()
+    generations = ".".join(str(g) for g in get_cache_generations(models))
+    key = f"count:{queryset.model._meta.label_lower}:{fingerprint}:{generations}"
+
+    def count():
+        estimate = _estimated_count(queryset)
+        if estimate is not None and estimate >= ESTIMATE_COUNT_THRESHOLD:
+            return estimate, False
+        return queryset.count(), True
+
+    return get_or_set_cache(key, count, timeout=COUNT_CACHE_TIMEOUT)
+
+
+class CachedCountPaginator(Paginator):
+    @cached_property
+    def count_result(self):
+        if not hasattr(self.object_list, "query"):
+            return len(self.object_list), True
+        return get_cached_count(self.object_list)
+
+    @cached_property
+    def count(self):
+        return self.count_result[0]
+
+    @property
+    def count_exact(self):
+        return self.count_result[1]
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on ``(created_at, id)``, newest first. Each page is one
+    indexed range query with no COUNT(*) and no OFFSET, so deep pages cost
+    the same as the first one, and rows inserted meanwhile never shift the
+    pages that follow. The order is fixed, so ``?ordering=`` is rejected.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 5
+    max_page_size = 1000
+
+    def encode_cursor(self, row, reverse):
+        payload = {"c": row.created_at.isoformat(), "i": str(row.pk), "r": reverse}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            created_at = parse_datetime(payload["c"])
+            if created_at is None:
+                raise ValueError
+            pk = model._meta.pk.to_python(payload["i"])
+            return created_at, pk, bool(payload["r"])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(_("Invalid cursor."))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            raise exceptions.ValidationError(
+                {
+                    api_settings.ORDERING_PARAM: _(
+                        "Cursor pages are always newest first and can't be ordered."
+                    )
+                }
+            )
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = bool(cursor and cursor[2])
+
+        if reverse:
+            queryset = queryset.order_by("created_at", "pk")
+        else:
+            queryset = queryset.order_by("-created_at", "-pk")
+        if cursor:
+            created_at, pk = cursor[:2]
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+                )
+
+        # One extra row tells whether there is a page beyond this one
+        rows = list(queryset[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1], False),
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            self.encode_cursor(self.page[0], True),
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
 
 class StandardResultsSetPagination(PageNumberPagination):
+    django_paginator_class = CachedCountPaginator
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 1000
+    # ?pagination=cursor switches to keyset pages (no count/num_pages)
+    pagination_query_param = "pagination"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(queryset, request):
+            self.keyset = KeysetPagination()
+            self.keyset.page_size = self.page_size
+            self.keyset.max_page_size = self.max_page_size
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def use_keyset(self, queryset, request):
+        if request.query_params.get(self.pagination_query_param) != "cursor":
+            return False
+        try:
+            queryset.model._meta.get_field("created_at")
+        except FieldDoesNotExist:
+            return False
+        return True
 
     def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
         return Response(
             {
                 "count": self.page.paginator.count,
+                "count_exact": self.page.paginator.count_exact,
                 "num_pages": self.page.paginator.num_pages,
                 "next": self.get_next_link(),
                 "previous": self.get_previous_link(),
@@ -0,0 +1,104 @@
+"""
+Derive select_related/prefetch_related from a serializer's fields.
+
+Dotted sources (``source="created_by.name"``), nested serializers and
+related fields are walked against the model: forward foreign keys and
+one-to-ones are joined with select_related, anything many-valued is
+prefetched. SerializerMethodField bodies can't be inspected, so views whose
+method fields touch relations still have to prefetch those by hand.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+
+def _walk(model, attrs, select, prefetch, prefix=""):
+    """
+    Follow ``attrs`` through the relations of ``model`` and record the
+    lookups needed to reach the last one without extra queries.
+    Returns the model reached, or None if the path leaves the model.
+    """
+    path = prefix
+    for attr in attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not field.is_relation:
+            return None
+        path = f"{path}__{attr}" if path else attr
+        if field.many_to_many or field.one_to_many:
+            prefetch.add(path)
+        elif path not in prefetch and not any(
+            path.startswith(f"{p}__") for p in prefetch
+        ):
+            select.add(path)
+        else:
+            prefetch.add(path)
+        model = field.related_model
+    return model
+
+
+def _collect(serializer, model, select, prefetch, prefix=""):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == "*":
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            continue
+        attrs = field.source.split(".")
+
+        if isinstance(field, serializers.ListSerializer):
+            related = _walk(model, attrs, select, prefetch, prefix)
+            child = field.child
+            if related is not None and isinstance(child, serializers.ModelSerializer):
+                # Everything below a many-valued relation has to be prefetched too
+                nested = set()
+                _collect(child, related, nested, nested)
+                path = "__".join(filter(None, [prefix] + attrs))
+                prefetch.update(f"{path}__{lookup}" for lookup in nested)
+        elif isinstance(field, serializers.ModelSerializer):
+            related = _walk(model, attrs, select, prefetch, prefix)
+            if related is not None:
+                path = "__".join(filter(None, [prefix] + attrs))
+                _collect(field, related, select, prefetch, path)
+        elif isinstance(field, ManyRelatedField):
+            _walk(model, attrs, select, prefetch, prefix)
+        elif isinstance(field, RelatedField):
+            # Primary key fields read the local "<name>_id" column
+            if not field.use_pk_only_optimization() or len(attrs) > 1:
+                _walk(model, attrs, select, prefetch, prefix)
+        elif len(attrs) > 1:
+            _walk(model, attrs[:-1], select, prefetch, prefix)
+
+
+def get_related_lookups(serializer, model):
+    """
+    Return ``(select_related, prefetch_related)`` lookups for rendering
+    instances of ``model`` with ``serializer``.
+    """
+    select, prefetch = set(), set()
+    _collect(serializer, model, select, prefetch)
+    return sorted(select), sorted(prefetch)
+
+
+def optimize_queryset(queryset, serializer):
+    """
+    Apply the lookups ``serializer`` needs to ``queryset``.
+    """
+    select, prefetch = get_related_lookups(serializer, queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class OptimizedQuerySetMixin:
+    """
+    For generic views: join/prefetch whatever the view's serializer reads,
+    so a page of results costs a fixed number of queries.
+    """
+
+    def get_queryset(self):
+        return optimize_queryset(super().get_queryset(), self.get_serializer())
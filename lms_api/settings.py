@@ -126,13 +126,17 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.BasicAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "lms_api.authentication.StatelessJWTAuthentication",
     ),
     "DEFAULT_THROTTLE_CLASSES": [
         "rest_framework.throttling.AnonRateThrottle",
         "rest_framework.throttling.UserRateThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "100/hour", "user": "1000/hour"},
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "100/hour",
+        "user": "1000/hour",
+        "check_fields_existence": "60/hour",
+    },
 }
 
 SIMPLE_JWT = {
@@ -184,12 +188,36 @@ MIDDLEWARE = [
 ]
 
 # Caching
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "lms-api-cache",
+# With REDIS_URL: two tiers, a per-process LRU in front of Redis shared by
+# all workers. Writes and deletes reach the other workers through version
+# stamps kept in Redis (checked at most every STAMP_CHECK_INTERVAL seconds).
+# The shared tier must have atomic add()/incr() (Redis or memcached, see
+# lms_api.cache_backends), so a file based cache can't be used.
+# Without REDIS_URL the cache is local to each process, which is only
+# correct when the site runs as a single worker process (e.g. runserver):
+# with several, invalidations would not reach the other workers.
+REDIS_URL = env("REDIS_URL", default=None)
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "lms_api.cache_backends.TwoTierCache",
+            "OPTIONS": {
+                "LOCAL_MAX_ENTRIES": 1000,
+                "LOCAL_TIMEOUT": 60,
+                "STAMP_CHECK_INTERVAL": 1,
+                "SHARED": {
+                    "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                    "LOCATION": REDIS_URL,
+                },
+            },
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
     }
-}
 
 """
 #FOR NAMECHEAP
@@ -309,6 +337,11 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Processes hashing passwords during CSV user imports (1 hashes inline)
+USER_IMPORT_HASH_WORKERS = min(4, os.cpu_count() or 1)
+# Passwords checked at once per process by logins; the rest wait for a slot
+LOGIN_HASH_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+
 
 AUTH_USER_MODEL = "user.User"
 
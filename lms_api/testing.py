@@ -0,0 +1,45 @@
+"""
+Helpers shared by the apps' tests.
+"""
+
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+from user.models import User
+
+
+def create_user(number, password=None, **extra_fields):
+    """
+    Create user ``number`` with a unique email and mobile number. Without
+    a password no hash is computed, which keeps tests fast.
+    """
+    fields = {
+        "name": f"user{number}",
+        "name_ar": f"user{number}",
+        "identification": "123456789",
+        "position": "p",
+        "user_type": "employee",
+        **extra_fields,
+    }
+    return User.objects.create_user(
+        email=f"user{number}@a.com",
+        mobile_number=f"01{number:09d}",
+        password=password,
+        **fields,
+    )
+
+
+class TempMediaRootMixin:
+    """
+    Store uploaded files in a temporary MEDIA_ROOT, removed after each test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
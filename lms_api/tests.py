@@ -0,0 +1,418 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, Group, Permission
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connection, models
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import isolate_apps
+from django.utils import translation
+
+from apps.a4_eduSys.models import EduSystem
+from apps.a5_stage.models import Stage
+from lms_api import utils
+from lms_api.cache_backends import TwoTierCache
+from lms_api.cache_keys import (
+    DEFAULT_VARY,
+    VARY_PERMISSIONS,
+    VARY_USER,
+    build_cache_key,
+    permission_fingerprint,
+)
+from lms_api.field_index import (
+    COLLATED_LOOKUP_CHUNK_SIZE,
+    _collated_matches,
+    _exact_matches,
+    find_existing_models,
+)
+from lms_api.utils import (
+    allocate_unique_slugs,
+    get_or_set_cache,
+    is_cache_generation_tracked,
+    save_with_unique_slug,
+)
+from lms_api.testing import create_user
+from user.models import User
+
+STAGE_LIST_PATH = "/en/api/stage/stage_list/"
+
+
+def two_tier_cache(location, stamp_check_interval=0):
+    # Instances sharing a LocMem location stand in for two worker processes
+    return TwoTierCache(
+        "",
+        {
+            "OPTIONS": {
+                "STAMP_CHECK_INTERVAL": stamp_check_interval,
+                "SHARED": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": location,
+                },
+            }
+        },
+    )
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.first = two_tier_cache("two-tier-tests")
+        self.second = two_tier_cache("two-tier-tests")
+        self.addCleanup(self.first.clear)
+
+    def test_value_set_by_one_instance_is_read_by_another(self):
+        self.first.set("key", "value")
+        self.assertEqual(self.second.get("key"), "value")
+
+    def test_set_replaces_local_copy_of_other_instance(self):
+        self.first.set("key", "old")
+        self.assertEqual(self.second.get("key"), "old")
+        self.first.set("key", "new")
+        self.assertEqual(self.second.get("key"), "new")
+
+    def test_delete_drops_local_copy_of_other_instance(self):
+        self.first.set("key", "value")
+        self.assertEqual(self.second.get("key"), "value")
+        self.first.delete("key")
+        self.assertIsNone(self.second.get("key"))
+
+    def test_incr_is_seen_by_other_instance(self):
+        self.first.set("counter", 1)
+        self.assertEqual(self.second.get("counter"), 1)
+        self.first.incr("counter")
+        self.assertEqual(self.second.get("counter"), 2)
+
+    def test_shared_backend_without_atomic_incr_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            TwoTierCache(
+                "",
+                {
+                    "OPTIONS": {
+                        "SHARED": {
+                            "BACKEND": "django.core.cache.backends.filebased."
+                            "FileBasedCache",
+                            "LOCATION": "unused",
+                        }
+                    }
+                },
+            )
+
+    def test_local_copy_is_served_within_stamp_check_interval(self):
+        worker = two_tier_cache("two-tier-tests", stamp_check_interval=60)
+        self.first.set("key", "value")
+        self.assertEqual(worker.get("key"), "value")
+        with mock.patch.object(worker._shared, "get_many") as get_many:
+            self.assertEqual(worker.get("key"), "value")
+        get_many.assert_not_called()
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class GetOrSetCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_one_compute_per_key_under_concurrency(self):
+        calls = {"a": 0, "b": 0}
+        lock = threading.Lock()
+
+        def compute(key):
+            with lock:
+                calls[key] += 1
+            time.sleep(0.1)
+            return key.upper()
+
+        keys = ["a", "b"] * 8
+        with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+            results = list(
+                pool.map(lambda key: get_or_set_cache(key, lambda: compute(key)), keys)
+            )
+        self.assertEqual(results, ["A", "B"] * 8)
+        self.assertEqual(calls, {"a": 1, "b": 1})
+
+    def test_unrelated_keys_compute_concurrently(self):
+        # Each computation waits for the other one; serialized, both time out
+        barrier = threading.Barrier(2, timeout=2)
+
+        def compute():
+            barrier.wait()
+            return True
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(
+                pool.map(lambda key: get_or_set_cache(key, compute), ["a", "b"])
+            )
+        self.assertEqual(results, [True, True])
+
+    def test_nested_computation_of_another_key(self):
+        value = get_or_set_cache(
+            "outer", lambda: get_or_set_cache("inner", lambda: 1) + 1
+        )
+        self.assertEqual(value, 2)
+
+    def expire(self, key, value, compute_time=0.0, refresh_in=-1):
+        cache.set(
+            key, utils._CachedValue(value, time.time() + refresh_in, compute_time), 60
+        )
+
+    def test_one_recompute_when_an_entry_expires_under_concurrency(self):
+        self.expire("key", "old")
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "new"
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(
+                pool.map(lambda _: get_or_set_cache("key", compute), range(8))
+            )
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), ["new"] + ["old"] * 7)
+        self.assertEqual(get_or_set_cache("key", compute), "new")
+
+    def test_stale_value_is_served_while_a_refresh_runs(self):
+        self.expire("key", "old")
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_compute():
+            started.set()
+            release.wait(2)
+            return "new"
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            refresh = pool.submit(get_or_set_cache, "key", slow_compute)
+            self.assertTrue(started.wait(2))
+            # Answered from the stale entry without computing or waiting
+            compute = mock.Mock(return_value="other")
+            self.assertEqual(get_or_set_cache("key", compute), "old")
+            compute.assert_not_called()
+            release.set()
+            self.assertEqual(refresh.result(), "new")
+        self.assertEqual(get_or_set_cache("key", compute), "new")
+
+    def test_slow_values_are_refreshed_early(self):
+        # Due in a minute, but it takes far longer than that to compute
+        self.expire("key", "old", compute_time=100, refresh_in=60)
+        with mock.patch.object(utils.random, "random", return_value=0.9):
+            self.assertEqual(get_or_set_cache("key", lambda: "new", beta=0), "old")
+            self.assertEqual(get_or_set_cache("key", lambda: "new"), "new")
+
+    def test_timeout_none_caches_for_good(self):
+        self.assertEqual(get_or_set_cache("key", lambda: 1, timeout=None), 1)
+        self.assertEqual(get_or_set_cache("key", lambda: 2, timeout=None), 1)
+
+
+class CacheKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def key(self, user, path=STAGE_LIST_PATH, vary=DEFAULT_VARY, **query):
+        request = self.factory.get(path, query)
+        # A fresh instance, as every request loads its user again
+        request.user = User.objects.get(pk=user.pk) if user.pk else user
+        return build_cache_key("view", request, vary)
+
+    def grant(self, user, codename):
+        user.user_permissions.add(Permission.objects.get(codename=codename))
+
+    def test_users_with_equal_permissions_share_a_key(self):
+        first, second = create_user(1), create_user(2)
+        for user in (first, second):
+            self.grant(user, "view_user")
+        vary = (VARY_PERMISSIONS,)
+        self.assertEqual(self.key(first, vary=vary), self.key(second, vary=vary))
+        vary = (VARY_USER,)
+        self.assertNotEqual(self.key(first, vary=vary), self.key(second, vary=vary))
+
+    def test_permission_changes_change_the_key(self):
+        user, other = create_user(1), create_user(2)
+        vary = (VARY_PERMISSIONS,)
+        before = self.key(user, vary=vary)
+        self.grant(user, "view_user")
+        granted = self.key(user, vary=vary)
+        self.assertNotEqual(granted, before)
+        group = Group.objects.create(name="viewers")
+        group.permissions.add(Permission.objects.get(codename="view_user"))
+        other.groups.add(group)
+        # Granted through a group is not the same as granted directly
+        self.assertNotEqual(self.key(other, vary=vary), granted)
+        fingerprints = {
+            permission_fingerprint(user)
+            for user in (
+                AnonymousUser(),
+                create_user(3, is_superuser=True),
+                create_user(4, is_active=False),
+                create_user(5),
+            )
+        }
+        self.assertEqual(len(fingerprints), 4)
+
+    def test_language_changes_the_key(self):
+        user = create_user(1)
+        with translation.override("en"):
+            english = self.key(user)
+        with translation.override("ar"):
+            arabic = self.key(user)
+        self.assertNotEqual(english, arabic)
+
+    def test_query_order_does_not_change_the_key(self):
+        user = create_user(1)
+        self.assertEqual(
+            self.key(user, page="2", search="a"), self.key(user, search="a", page="2")
+        )
+        self.assertNotEqual(self.key(user, page="2"), self.key(user, page="3"))
+        self.assertNotEqual(
+            self.key(user), self.key(user, path="/en/api/stage/stage_dialog/")
+        )
+
+
+class UniqueSlugTests(TestCase):
+    # Group.name is unique and short enough to stand in for a slug field
+
+    def allocate(self, names):
+        return allocate_unique_slugs(Group.objects.all(), names, field="name")
+
+    def test_taken_slugs_get_the_first_free_suffix_in_one_query(self):
+        Group.objects.bulk_create(
+            Group(name=name) for name in ["teachers", "teachers-2", "teachers-4"]
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(self.allocate(["Teachers"]), ["teachers-3"])
+
+    def test_bulk_allocation_counts_its_own_slugs_as_taken(self):
+        Group.objects.create(name="students")
+        with self.assertNumQueries(2):
+            slugs = self.allocate(["Students", "students", "Staff", "Students"])
+        self.assertEqual(slugs, ["students-2", "students-3", "staff", "students-4"])
+
+    def test_long_names_are_truncated_to_fit_the_suffix(self):
+        max_length = Group._meta.get_field("name").max_length
+        name = "a" * (max_length + 10)
+        Group.objects.create(name=name[:max_length])
+        slug = self.allocate([name])[0]
+        self.assertEqual(len(slug), max_length)
+        self.assertTrue(slug.endswith("-2"))
+
+    def test_concurrent_insert_of_the_same_slug_is_retried(self):
+        Group.objects.create(name="teachers")
+        allocate = utils.allocate_unique_slugs
+        calls = []
+
+        def lose_the_first_race(queryset, names, field):
+            calls.append(names)
+            # The first answer was taken by someone else meanwhile
+            return ["teachers"] if len(calls) == 1 else allocate(queryset, names, field)
+
+        group = Group(name="Teachers")
+        with mock.patch.object(utils, "allocate_unique_slugs", lose_the_first_race):
+            save_with_unique_slug(group, source="name", field="name")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(group.name, "teachers-2")
+
+    def test_retries_are_bounded(self):
+        Group.objects.create(name="teachers")
+        group = Group(name="Teachers")
+        with mock.patch.object(
+            utils, "allocate_unique_slugs", return_value=["teachers"]
+        ) as allocate:
+            with self.assertRaises(IntegrityError):
+                save_with_unique_slug(group, source="name", field="name", retries=2)
+        self.assertEqual(allocate.call_count, 3)
+
+
+class FindExistingModelsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        shared = EduSystem.objects.create(name="shared", name_ar="shared-ar")
+        EduSystem.objects.create(name="system", name_ar="system-ar")
+        self.stage = Stage.objects.create(
+            name="shared", name_ar="stage-ar", edu_system=shared
+        )
+        self.user = create_user(1)
+
+    def test_each_value_is_found_in_its_own_models_in_one_query(self):
+        cases = [
+            ("name", "shared", ["EduSystem", "Stage"]),
+            ("name", "system", ["EduSystem"]),
+            ("name_ar", "stage-ar", ["Stage"]),
+            ("email", self.user.email, ["User"]),
+            ("id", str(self.stage.pk), ["Stage"]),
+            ("id", str(self.user.pk), ["User"]),
+            ("name", "missing", []),
+        ]
+        for field_name, value, expected in cases:
+            with self.subTest(field=field_name, value=value):
+                with self.assertNumQueries(1):
+                    self.assertEqual(find_existing_models(field_name, value), expected)
+
+    def test_values_no_column_can_hold_cost_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(find_existing_models("id", "not-a-uuid"), [])
+            self.assertEqual(find_existing_models("not_indexed", "value"), [])
+
+    def test_cached_answer_is_invalidated_by_writes(self):
+        self.assertTrue(is_cache_generation_tracked([EduSystem, Stage]))
+        self.assertEqual(find_existing_models("name", "new"), [])
+        with self.assertNumQueries(0):
+            self.assertEqual(find_existing_models("name", "new"), [])
+        Stage.objects.create(
+            name="new", name_ar="new-ar", edu_system=self.stage.edu_system
+        )
+        self.assertEqual(find_existing_models("name", "new"), ["Stage"])
+
+
+class CollatedExistenceTests(TransactionTestCase):
+    # A table whose email column has SQLite's NOCASE collation, which like
+    # MySQL's default collations matches "A@A.COM" for "a@a.com"
+
+    @isolate_apps("lms_api")
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("NOCASE is a SQLite collation")
+
+        class Probe(models.Model):
+            email = models.CharField(max_length=50, unique=True, db_collation="NOCASE")
+
+            class Meta:
+                app_label = "lms_api"
+
+        with connection.schema_editor() as editor:
+            editor.create_model(Probe)
+        self.addCleanup(self.drop_model, Probe)
+        Probe.objects.create(email="a@a.com")
+        self.model = Probe
+        self.field = Probe._meta.get_field("email")
+
+    def drop_model(self, model):
+        with connection.schema_editor() as editor:
+            editor.delete_model(model)
+
+    def test_collated_values_are_matched_by_the_database(self):
+        keys = ["A@A.COM", "a@a.com", "b@a.com"]
+        self.assertEqual(
+            _collated_matches(self.model, self.field, keys), {"A@A.COM", "a@a.com"}
+        )
+        # A Python-side match of the stored value misses the other spelling
+        self.assertEqual(
+            _exact_matches(self.model, self.field, keys, chunk_size=10), {"a@a.com"}
+        )
+
+    def test_collated_lookups_are_chunked(self):
+        keys = [f"{n}@a.com" for n in range(COLLATED_LOOKUP_CHUNK_SIZE)] + ["A@a.com"]
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                _collated_matches(self.model, self.field, keys), {"A@a.com"}
+            )
@@ -7,6 +7,7 @@ from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
 
 from lms_api.utils import CheckFieldValueExistenceView
+from user.views import CheckFieldsValueExistenceView
 from lms_api.schema import schema
 
 urlpatterns = [
@@ -19,6 +20,7 @@ urlpatterns += i18n_patterns(
     # path("auth/", include("djoser.urls.authtoken")),
     path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema))),
     path("api/check_field_existence/", CheckFieldValueExistenceView.as_view(), name="check-field-existence"),
+    path("api/check_fields_existence/", CheckFieldsValueExistenceView.as_view(), name="check-fields-existence"),
 
 
     path("api/users/", include("user.urls")),
@@ -1,41 +1,161 @@
 import string, random
-from django.db.models.signals import  post_migrate
+from django.db.models.signals import post_migrate, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils.text import slugify
-from django.apps import apps
-from django.db.models import Q
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
+from django.db import IntegrityError, transaction
 
-from django.utils.translation import gettext_lazy as _
+from django.utils.translation import gettext_lazy as _, get_language
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from rest_framework.views import APIView
 from django.contrib.auth.models import Group, Permission
 
 
 
+import hashlib
 import random
+import math
+import threading
+import time
+from collections import namedtuple
 from django.utils.timezone import now
 
 
 from django.core.cache import cache
+from contextlib import contextmanager
 from functools import wraps
 from rest_framework.response import Response
 from rest_framework import status
 
+from lms_api.cache_keys import DEFAULT_VARY, build_cache_key
+from lms_api.cache_versions import bump_version, get_versions
 
 
-def get_or_set_cache(key, func, timeout=300):
+# Stored in place of None so a cached None is not mistaken for a miss
+CACHED_NONE = "__lms_cached_none__"
+_MISS = object()
+
+
+class _CachedValue(namedtuple("_CachedValue", ["value", "refresh_at", "compute_time"])):
+    """
+    What get_or_set_cache stores: the value, when it should be recomputed
+    (it is kept a while longer as a stale fallback) and how long computing
+    it took, which drives probabilistic early refresh.
+    """
+
+
+# key -> [lock, number of threads using it]; an entry lives while in use, so
+# unrelated keys never wait on each other and memory stays bounded
+_COMPUTE_LOCKS = {}
+_COMPUTE_LOCKS_GUARD = threading.Lock()
+
+
+@contextmanager
+def _compute_lock(key, blocking=True):
+    """
+    Hold the per-process lock of ``key``; yields whether it was acquired.
+    """
+    with _COMPUTE_LOCKS_GUARD:
+        slot = _COMPUTE_LOCKS.setdefault(key, [threading.Lock(), 0])
+        slot[1] += 1
+    try:
+        acquired = slot[0].acquire(blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                slot[0].release()
+    finally:
+        with _COMPUTE_LOCKS_GUARD:
+            slot[1] -= 1
+            if not slot[1]:
+                del _COMPUTE_LOCKS[key]
+
+
+def _should_refresh(entry, beta):
+    # Probabilistic early expiration ("XFetch"): the closer the entry is to
+    # its refresh time and the slower it is to compute, the likelier a caller
+    # refreshes it early, so expiries of hot keys are spread out.
+    jitter = -entry.compute_time * beta * math.log(1.0 - random.random())
+    return time.time() + jitter >= entry.refresh_at
+
+
+def _compute_and_set(key, func, timeout, stale_timeout):
+    started = time.time()
+    data = func()
+    finished = time.time()
+    if timeout is None:
+        # Never expires, so it is never refreshed either
+        entry = _CachedValue(data, math.inf, finished - started)
+        cache.set(key, entry, None)
+    else:
+        entry = _CachedValue(data, finished + timeout, finished - started)
+        cache.set(key, entry, timeout + stale_timeout)
+    return data
+
+
+def get_or_set_cache(
+    key,
+    func,
+    timeout=300,
+    stale_timeout=60,
+    beta=1.0,
+    shared_lock=False,
+    lock_timeout=10,
+):
     """
     Retrieve data from cache or execute the function and cache its result.
+    Only one caller per process (per cluster with shared_lock) computes a
+    missing or expired value; while it does, the others get the last value.
     :param key: Cache key
     :param func: Callable that returns the data
-    :param timeout: Time to live in seconds
+    :param timeout: Time to live in seconds; None caches it for good
+    :param stale_timeout: How long after `timeout` the old value may still be
+        served while one caller recomputes it
+    :param beta: Aggressiveness of early refresh (0 disables it)
+    :param shared_lock: Also take a lock in the shared cache, so only one
+        worker process computes the value
+    :param lock_timeout: Upper bound in seconds on waiting for/holding the
+        shared lock
     :return: Cached or newly computed data
     """
-    data = cache.get(key)
-    if data is None:
-        data = func()
-        cache.set(key, data, timeout)
-    return data
+    entry = cache.get(key)
+    if isinstance(entry, _CachedValue):
+        if not _should_refresh(entry, beta):
+            return entry.value
+        # Due for refresh: one caller recomputes, everybody else serves stale
+        with _compute_lock(key, blocking=False) as acquired:
+            if not acquired:
+                return entry.value
+            if shared_lock and not cache.add(f"{key}:lock", 1, lock_timeout):
+                return entry.value
+            try:
+                return _compute_and_set(key, func, timeout, stale_timeout)
+            finally:
+                if shared_lock:
+                    cache.delete(f"{key}:lock")
+
+    # Nothing to fall back on: wait for whoever is already computing it
+    with _compute_lock(key):
+        entry = cache.get(key)
+        if isinstance(entry, _CachedValue):
+            return entry.value
+        locked = False
+        if shared_lock:
+            deadline = time.time() + lock_timeout
+            while not locked and time.time() < deadline:
+                locked = cache.add(f"{key}:lock", 1, lock_timeout)
+                if not locked:
+                    time.sleep(0.05)
+                    entry = cache.get(key)
+                    if isinstance(entry, _CachedValue):
+                        return entry.value
+        try:
+            return _compute_and_set(key, func, timeout, stale_timeout)
+        finally:
+            if locked:
+                cache.delete(f"{key}:lock")
 
 
 def clear_cache_key(key):
@@ -45,25 +165,199 @@ def clear_cache_key(key):
     cache.delete(key)
 
 
-def cache_response(timeout=300, key_prefix=""):
+# prefix -> (model, models whose changes also invalidate its cached payloads)
+_DETAIL_CACHES = {}
+
+
+def _detail_version_key(prefix, object_id):
+    return f"detail_version_{prefix}_{object_id}"
+
+
+def detail_cache_key(prefix, object_id, language=None, vary=()):
+    """
+    Cache key of a serialized detail payload, per object, language and
+    `vary` values (anything else the payload depends on, e.g. the host of
+    absolute URLs). The id is normalized to its stored form, so every
+    spelling of it (e.g. an uppercase UUID) shares the entry that signals
+    invalidate. Raises ValidationError for a malformed id.
+
+    The key embeds the object's detail version stamp and the generations of
+    the related models registered for `prefix`, read in one cache round
+    trip, so a write to either changes the key of every variant.
+    """
+    model, related = _DETAIL_CACHES[prefix]
+    object_id = model._meta.pk.to_python(object_id)
+    version_key = _detail_version_key(prefix, object_id)
+    generation_keys = [_cache_generation_key(m) for m in related]
+    versions = get_versions([version_key] + generation_keys)
+    key = f"{prefix}_detail_{object_id}:{language or get_language()}"
+    if vary:
+        digest = hashlib.md5("\n".join(str(v) for v in vary).encode()).hexdigest()
+        key = f"{key}:{digest}"
+    stamps = [versions[version_key]] + [versions[k] for k in generation_keys]
+    return f"{key}:{'.'.join(str(stamp) for stamp in stamps)}"
+
+
+def clear_detail_cache(prefix, *object_ids):
+    """
+    Drop the cached detail payloads of the given objects, in every
+    language and variant.
+    """
+    model, _related = _DETAIL_CACHES[prefix]
+    for object_id in object_ids:
+        bump_version(_detail_version_key(prefix, model._meta.pk.to_python(object_id)))
+
+
+def register_detail_cache(model, prefix, related=()):
+    """
+    Invalidate the cached detail payloads of `model` from its own
+    post_save/post_delete signals. Call from the app's AppConfig.ready().
+    :param related: Models the payload also reads from (foreign keys,
+        memberships); any write to them invalidates all payloads of `model`
+    """
+    _DETAIL_CACHES[prefix] = (model, tuple(related))
+    track_cache_generation(*related)
+
+    def invalidate(sender, instance, **kwargs):
+        clear_detail_cache(prefix, instance.pk)
+
+    uid = f"detail_cache_{prefix}"
+    post_save.connect(invalidate, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(invalidate, sender=model, weak=False, dispatch_uid=uid)
+
+
+def get_or_set_detail_cache(prefix, object_id, func, timeout=300, vary=()):
+    """
+    Cache the serialized payload `func` returns for one object, so a hit
+    costs neither a query nor serializer work. A malformed id is a 404.
+    :param vary: Values besides the object and language the payload
+        depends on (query options, request host); each gets its own entry
+    """
+    try:
+        key = detail_cache_key(prefix, object_id, vary=vary)
+    except ValidationError:
+        raise Http404
+    return get_or_set_cache(key, lambda: dict(func()), timeout=timeout)
+
+
+def cache_response(timeout=300, key_prefix="", models=(), vary=DEFAULT_VARY):
     """
     Decorator for DRF views (GET methods only) to cache their response.
+    :param models: Models the response is built from; the entry is dropped
+        as soon as any of them is written to (see bump_cache_generation).
+    :param vary: What the response depends on besides the path, see
+        lms_api.cache_keys (language, query params, permissions, user).
     """
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped_view(self, request, *args, **kwargs):
-            key = f"{key_prefix}:{request.get_full_path()}"
-            cached = cache.get(key)
-            if cached:
-                return Response(cached)
+            generations = get_cache_generations(models) if models else ()
+            key = build_cache_key(key_prefix, request, vary, generations)
+            cached = cache.get(key, _MISS)
+            if cached is not _MISS:
+                return Response(None if cached == CACHED_NONE else cached)
 
             response = view_func(self, request, *args, **kwargs)
             if isinstance(response, Response) and response.status_code == 200:
-                cache.set(key, response.data, timeout)
+                data = response.data
+                cache.set(key, CACHED_NONE if data is None else data, timeout)
             return response
         return _wrapped_view
     return decorator
 
+
+def _cache_generation_key(model):
+    return f"cache_generation_{model._meta.label_lower}"
+
+
+# Models whose writes bump their cache generation, see track_cache_generation
+_TRACKED_MODELS = set()
+
+
+def track_cache_generation(*models):
+    """
+    Bump the cache generation of each model on its post_save/post_delete
+    and m2m changes. Call from the app's AppConfig.ready() for every model
+    a cached response, count or existence check is built from.
+    """
+    for model in models:
+        _TRACKED_MODELS.add(model)
+        uid = f"cache_generation_{model._meta.label_lower}"
+        post_save.connect(
+            bump_cache_generation_on_write, sender=model, dispatch_uid=uid
+        )
+        post_delete.connect(
+            bump_cache_generation_on_write, sender=model, dispatch_uid=uid
+        )
+
+
+def is_cache_generation_tracked(models):
+    return all(model in _TRACKED_MODELS for model in models)
+
+
+def get_cache_generations(models):
+    """
+    Return the current cache generation of each model, in one cache round trip.
+    """
+    untracked = [model for model in models if model not in _TRACKED_MODELS]
+    if untracked:
+        raise ImproperlyConfigured(
+            "Cache generations of %s are not tracked; call "
+            "track_cache_generation() from AppConfig.ready()."
+            % ", ".join(model._meta.label for model in untracked)
+        )
+    keys = [_cache_generation_key(model) for model in models]
+    versions = get_versions(keys)
+    return [versions[key] for key in keys]
+
+
+_deferred_generations = threading.local()
+
+
+def bump_cache_generation(*models):
+    """
+    Invalidate every cached list built from the given models.
+    Called automatically on save/delete/m2m changes; call it explicitly after
+    QuerySet.update() or other writes that bypass model signals.
+    """
+    pending = getattr(_deferred_generations, "models", None)
+    for model in models:
+        if pending is not None:
+            pending[model] = None
+        else:
+            bump_version(_cache_generation_key(model))
+
+
+@contextmanager
+def batched_cache_generation_bumps():
+    """
+    Bump each model's generation once when the block exits, however many
+    rows it writes (e.g. a QuerySet.delete() sending post_delete per row).
+    """
+    if getattr(_deferred_generations, "models", None) is not None:
+        # Nested: the outermost block bumps
+        yield
+        return
+    _deferred_generations.models = {}
+    try:
+        yield
+    finally:
+        models = _deferred_generations.models
+        _deferred_generations.models = None
+        bump_cache_generation(*models)
+
+
+def bump_cache_generation_on_write(sender, **kwargs):
+    bump_cache_generation(sender)
+
+
+@receiver(m2m_changed)
+def bump_cache_generation_on_m2m_change(sender, instance, action, model, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_cache_generation(
+            *(m for m in (instance.__class__, model) if m in _TRACKED_MODELS)
+        )
+
 ########################################################
 
 
@@ -71,23 +365,69 @@ def random_string_generator(size=10, chars=string.ascii_lowercase + string.digit
     return "".join(random.choice(chars) for _ in range(size))
 
 
-def unique_slug_generator(instance, new_slug=None):
-    if new_slug is not None:
-        slug = new_slug
-    else:
-        slug = slugify(instance.name)
+# Room kept at the end of a slug for a "-<n>" suffix
+SLUG_SUFFIX_LENGTH = 7
+
+
+def allocate_unique_slugs(queryset, names, field="slug"):
+    """
+    Return a unique slug for each of ``names`` (e.g. for a bulk_create).
+    Existing slugs are fetched with one ``LIKE 'base%'`` query per distinct
+    base and the first free ``-<n>`` suffix is picked in memory; slugs
+    handed out earlier in the same call count as taken.
+    """
+    max_length = queryset.model._meta.get_field(field).max_length
+    prefix_length = max_length - SLUG_SUFFIX_LENGTH
+    taken = {}
+    slugs = []
+    for name in names:
+        base = slugify(name)[:max_length] or random_string_generator(size=4)
+        # Every candidate (base or truncated base + suffix) starts with this
+        prefix = base[:prefix_length]
+        if prefix not in taken:
+            taken[prefix] = set(
+                queryset.filter(**{f"{field}__startswith": prefix}).values_list(
+                    field, flat=True
+                )
+            )
+        slug = base
+        n = 2
+        while slug in taken[prefix]:
+            suffix = f"-{n}"
+            slug = base[: max_length - len(suffix)] + suffix
+            n += 1
+        taken[prefix].add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def unique_slug_generator(instance, new_slug=None, field="slug"):
     Klass = instance.__class__
-    max_length = Klass._meta.get_field("slug").max_length
-    slug = slug[:max_length]
-    qs_exists = Klass.objects.filter(slug=slug).exists()
+    queryset = Klass._default_manager.all()
+    if instance.pk is not None:
+        queryset = queryset.exclude(pk=instance.pk)
+    return allocate_unique_slugs(queryset, [new_slug or instance.name], field)[0]
 
-    if qs_exists:
-        new_slug = "{slug}-{randstr}".format(
-            slug=slug[: max_length - 5], randstr=random_string_generator(size=4)
-        )
 
-        return unique_slug_generator(instance, new_slug=new_slug)
-    return slug
+def save_with_unique_slug(instance, source="name", field="slug", retries=3):
+    """
+    Assign a unique slug from ``source`` and save. A concurrent insert that
+    takes the same slug first makes the save fail with IntegrityError; the
+    slug is then re-allocated, up to ``retries`` times.
+    """
+    for attempt in range(retries + 1):
+        setattr(
+            instance,
+            field,
+            unique_slug_generator(instance, getattr(instance, source), field),
+        )
+        try:
+            with transaction.atomic():
+                instance.save()
+            return instance
+        except IntegrityError:
+            if attempt == retries:
+                raise
 
 
 class CheckFieldValueExistenceView(APIView):
@@ -105,19 +445,10 @@ class CheckFieldValueExistenceView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        app_models = apps.get_models()
-
-        # List to store model names where the field exists
-        existing_models = []
+        from lms_api.field_index import find_existing_models
 
-        # Iterate through all models and check if the field exists
-        for model in app_models:
-            if hasattr(model, field_name):
-                # Use Q objects to handle fields with the same name
-                filter_query = Q(**{field_name: field_value})
-                exists = model.objects.filter(filter_query).exists()
-                if exists:
-                    existing_models.append(model.__name__)
+        # Only unique/indexed fields of the project's models, in one query
+        existing_models = find_existing_models(field_name, field_value)
 
         if existing_models:
             message = _(
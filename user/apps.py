@@ -7,6 +7,18 @@ class UserConfig(AppConfig):
     name = "user"
 
     def ready(self):
+        from django.contrib.auth.models import Group, Permission
         from lms_api.utils import create_initial_groups  # Import your signals module
+        from lms_api.utils import register_detail_cache, track_cache_generation
+        from lms_api.field_index import get_field_index
+        import lms_api.custom_permissions  # noqa: F401 permission snapshot signals
+        import lms_api.authentication  # noqa: F401 token claim signals
+        import user.images  # noqa: F401 image cleanup signals
+        from user.models import User
 
         post_migrate.connect(create_initial_groups, sender=self)
+        track_cache_generation(User, Group, Permission)
+        # Group/Permission generations also move on membership changes
+        register_detail_cache(User, "user", related=[Group, Permission])
+        # Build the existence-check field index once, at startup
+        get_field_index()
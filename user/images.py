@@ -0,0 +1,321 @@
+"""
+Out-of-band processing of user images.
+
+Each new photo or cover is decoded once, downscaled while decoding
+(Image.draft), and every output is written from that single decode: the
+size-capped photo, the avatar and the WebP/JPEG renditions listed in
+RENDITIONS. This runs on a small local thread pool after the saving
+transaction commits, so uploads return without touching the image.
+
+Outputs are stored content-addressed (``images/<sha256>.<ext>``), so
+identical uploads and renditions share one file. A file a user stops using
+(image replaced, user deleted) is released: after commit, it is deleted
+unless another user still refers to it. The default images every new user
+starts with are never deleted.
+
+An upload may reuse a stored file just as a release finds it unreferenced.
+Both sides check again once they are done: a release keeps the bytes it
+deleted and puts back whatever became referenced meanwhile, and processing
+re-saves any reused file that is gone after its row committed. Whichever
+order the two run in, the file a committed row refers to exists.
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from PIL import Image
+
+from lms_api.utils import bump_cache_generation, clear_detail_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_PHOTO_BYTES = 1024 * 1024  # 1 MB
+AVATAR_SIZE = (300, 300)
+CONTENT_ADDRESSED_DIR = "images"
+# Shared by every user who hasn't uploaded their own image
+DEFAULT_IMAGES_DIR = "default_photos"
+
+# Bounding boxes per image field; aspect ratio is kept
+RENDITIONS = {
+    "photo": {"small": (160, 160), "medium": (640, 640), "large": (1280, 1280)},
+    "avatar": {"small": (64, 64), "medium": (150, 150)},
+    "cover": {"medium": (960, 960), "large": (1920, 1920)},
+}
+RENDITION_FORMATS = {"webp": ("WEBP", {"quality": 80}), "jpeg": ("JPEG", {"quality": 85})}
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+# Pillow releases the GIL while decoding/resampling, so threads are enough
+_IMAGE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="user-images")
+
+
+def schedule_image_processing(user_id, fields):
+    """
+    Process the user's ``fields`` ("photo", "cover") in the background once
+    the current transaction commits.
+    """
+    fields = tuple(fields)
+    transaction.on_commit(
+        lambda: _IMAGE_EXECUTOR.submit(process_user_images, user_id, fields)
+    )
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(f"{CONTENT_ADDRESSED_DIR}/")
+
+
+def is_shared(name):
+    return is_content_addressed(name) or name.startswith(f"{DEFAULT_IMAGES_DIR}/")
+
+
+def content_addressed_names(row):
+    """
+    Return the content-addressed names a user ``row`` (a dict of the image
+    fields and "renditions") refers to.
+    """
+    names = {str(value or "") for key, value in row.items() if key != "renditions"}
+    for sizes in (row.get("renditions") or {}).values():
+        for formats in sizes.values():
+            names.update(formats.values())
+    return {name for name in names if is_content_addressed(name)}
+
+
+def release_images(names):
+    """
+    Once the current transaction commits, delete those of ``names`` that no
+    user refers to any more (in the background: it scans the users table).
+    """
+    names = {name for name in names if is_content_addressed(name)}
+    if names:
+        transaction.on_commit(
+            lambda: _IMAGE_EXECUTOR.submit(delete_unreferenced_images, names)
+        )
+
+
+def names_in_use(names):
+    """
+    Return those of ``names`` some user refers to, in one query.
+    """
+    from user.models import User
+
+    referenced = Q()
+    for field in User.IMAGE_FIELDS:
+        referenced |= Q(**{f"{field}__in": names})
+    for name in names:
+        referenced |= Q(renditions_text__contains=name)
+    rows = (
+        User.objects.annotate(renditions_text=Cast("renditions", TextField()))
+        .filter(referenced)
+        .values(*User.IMAGE_FIELDS, "renditions")
+    )
+    in_use = set()
+    for row in rows:
+        in_use |= content_addressed_names(row)
+    return in_use & set(names)
+
+
+def delete_unreferenced_images(names):
+    from user.models import User
+
+    close_old_connections()
+    try:
+        storage = User._meta.get_field("photo").storage
+        deleted = {}
+        for name in names - names_in_use(names):
+            try:
+                with storage.open(name, "rb") as f:
+                    deleted[name] = f.read()
+            except OSError:
+                continue
+            storage.delete(name)
+        if deleted:
+            # An upload may have started using one of them meanwhile
+            for name in names_in_use(set(deleted)):
+                ensure_stored(storage, name, deleted[name])
+    except Exception:
+        logger.exception("Deleting released user images failed")
+    finally:
+        connections.close_all()
+
+
+@receiver(post_delete, sender="user.User")
+def release_deleted_user_images(sender, instance, **kwargs):
+    row = {field: getattr(instance, field).name for field in sender.IMAGE_FIELDS}
+    row["renditions"] = instance.renditions
+    release_images(content_addressed_names(row))
+
+
+def ensure_stored(storage, name, data):
+    """
+    Save ``data`` as ``name`` unless that file exists already.
+    """
+    if not storage.exists(name):
+        saved = storage.save(name, ContentFile(data))
+        if saved != name:
+            # Lost a race against an identical write; keep the first copy
+            storage.delete(saved)
+
+
+def store_content_addressed(storage, data, extension):
+    """
+    Save ``data`` under its content hash and return the storage name;
+    identical bytes are stored once.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    name = f"{CONTENT_ADDRESSED_DIR}/{digest[:2]}/{digest}.{extension}"
+    ensure_stored(storage, name, data)
+    return name
+
+
+def _encode(img, image_format, **options):
+    buffer = BytesIO()
+    if image_format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    elif image_format == "WEBP" and img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    img.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def _renditions(img, field):
+    """
+    Yield ``(size_name, format_name, bytes)`` for the renditions of ``field``.
+    """
+    for size_name, box in RENDITIONS[field].items():
+        resized = img.copy()
+        resized.thumbnail(box, reducing_gap=2.0)
+        for format_name, (image_format, options) in RENDITION_FORMATS.items():
+            yield size_name, format_name, _encode(resized, image_format, **options)
+
+
+def _largest_box(*boxes):
+    return max(box[0] for box in boxes), max(box[1] for box in boxes)
+
+
+def render_images(field, data):
+    """
+    Decode an uploaded ``field`` image once and return its outputs as
+    ``{field: (bytes, format), "avatar": (bytes, format), "renditions":
+    {field: [(size, format, bytes), ...]}}``; "avatar" only for photos.
+    """
+    outputs = {"renditions": {}}
+    with Image.open(BytesIO(data)) as img:
+        image_format = img.format or "PNG"
+        width, height = img.size
+        target = None
+        if field == "photo" and len(data) > MAX_PHOTO_BYTES:
+            # Shrink the area in proportion to the file size
+            scale = (MAX_PHOTO_BYTES / len(data)) ** 0.5
+            target = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+        # Decode only as much resolution as the biggest output needs
+        boxes = list(RENDITIONS[field].values())
+        if field == "photo":
+            boxes.append(AVATAR_SIZE)
+        if target is not None:
+            boxes.append(target)
+        img.draft(img.mode, _largest_box(*boxes))
+        img.load()
+
+        if target is not None:
+            resized = img.copy()
+            resized.thumbnail(target, reducing_gap=2.0)
+            outputs[field] = (_encode(resized, image_format), image_format)
+        else:
+            outputs[field] = (data, image_format)
+        outputs["renditions"][field] = list(_renditions(img, field))
+
+        if field == "photo":
+            avatar = img.resize(AVATAR_SIZE)
+            outputs["avatar"] = (_encode(avatar, "PNG"), "PNG")
+            outputs["renditions"]["avatar"] = list(_renditions(avatar, "avatar"))
+    return outputs
+
+
+def process_user_images(user_id, fields):
+    from user.models import User
+
+    close_old_connections()
+    try:
+        for field in fields:
+            user = User.objects.filter(pk=user_id).first()
+            if user is None:
+                return
+            file = getattr(user, field)
+            if not file or is_content_addressed(file.name):
+                continue
+            storage = file.storage
+            original_name = file.name
+            with file.open("rb") as f:
+                data = f.read()
+            outputs = render_images(field, data)
+            # Storage name -> bytes of every file the row will refer to
+            contents = {}
+
+            def store(content, extension):
+                name = store_content_addressed(storage, content, extension)
+                contents[name] = content
+                return name
+
+            updates = {}
+            for name, value in outputs.items():
+                if name == "renditions":
+                    continue
+                content, image_format = value
+                updates[name] = store(content, EXTENSIONS.get(image_format, "img"))
+            stored = {}
+            for name, items in outputs["renditions"].items():
+                stored[name] = {}
+                for size_name, format_name, content in items:
+                    stored[name].setdefault(size_name, {})[format_name] = store(
+                        content, format_name
+                    )
+
+            with transaction.atomic():
+                # Only apply if the image wasn't replaced while we were working
+                row = (
+                    User.objects.select_for_update()
+                    .filter(pk=user_id, **{field: original_name})
+                    .values("renditions", "avatar")
+                    .first()
+                )
+                if row is None:
+                    continue
+                renditions = row["renditions"] or {}
+                updates["renditions"] = {**renditions, **stored}
+                User.objects.filter(pk=user_id).update(**updates)
+                # The avatar and renditions this upload replaces
+                release_images(
+                    content_addressed_names(
+                        {
+                            "avatar": row["avatar"] if "avatar" in updates else None,
+                            "renditions": {
+                                name: renditions[name]
+                                for name in stored
+                                if name in renditions
+                            },
+                        }
+                    )
+                )
+
+            # A release may have deleted a reused file before the row committed
+            for name, content in contents.items():
+                ensure_stored(storage, name, content)
+            if not is_shared(original_name):
+                storage.delete(original_name)
+            old_avatar = row["avatar"]
+            if "avatar" in updates and old_avatar and not is_shared(old_avatar):
+                storage.delete(old_avatar)
+        bump_cache_generation(User)
+        clear_detail_cache("user", user_id)
+    except Exception:
+        logger.exception("Processing the images of user %s failed", user_id)
+    finally:
+        connections.close_all()
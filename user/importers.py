@@ -0,0 +1,431 @@
+"""
+Bulk import of users from a CSV roster.
+
+Rows are read as a stream and handled in chunks: duplicates are checked with
+one query per chunk, passwords are hashed in a process pool, and each chunk
+is written with a single bulk_create inside its own transaction.
+
+The pool has settings.USER_IMPORT_HASH_WORKERS processes at most. It is
+started by the first import that needs it and kept for the following ones,
+since spawning the processes (and setting Django up in each) takes seconds.
+
+Uploads are imported as UserImportJob rows by a background worker thread, so
+the request returns immediately and progress is polled from the job.
+
+Jobs live in memory until they run, so a restart loses them. The WSGI/ASGI
+entry points call recover_import_jobs() when a server process starts: jobs
+still pending are queued again, and jobs left running without a heartbeat
+for IMPORT_JOB_STALE_AFTER are marked failed. A running job beats after
+every chunk and every IMPORT_JOB_HEARTBEAT_INTERVAL while hashing, so a slow
+chunk is never mistaken for a dead job; a job failed by recovery is never
+marked finished afterwards. Chunks committed before the
+interruption are kept, so those jobs are failed rather than rerun (a rerun
+would report every imported row as a duplicate).
+"""
+
+import csv
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import timedelta
+from io import TextIOWrapper
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.translation import gettext as _
+
+from lms_api.utils import bump_cache_generation
+from user.models import User, UserImportJob
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+# Below this many passwords a process pool costs more than it saves
+POOL_THRESHOLD = 50
+# A running job that hasn't reported progress for this long is abandoned
+IMPORT_JOB_STALE_AFTER = timedelta(minutes=10)
+# Seconds between heartbeats of a running job, well within STALE_AFTER
+IMPORT_JOB_HEARTBEAT_INTERVAL = 30
+
+REQUIRED_COLUMNS = [
+    "email",
+    "password",
+    "name",
+    "name_ar",
+    "identification",
+    "position",
+    "user_type",
+    "mobile_number",
+]
+
+
+def _hash_password(password):
+    return make_password(password)
+
+
+# workers -> the process pool; in practice there is a single one
+_HASH_POOLS = {}
+_HASH_POOLS_LOCK = threading.Lock()
+
+
+def get_hash_pool(workers):
+    """
+    Return the process pool hashing import passwords on ``workers``
+    processes, starting it on first use.
+    """
+    with _HASH_POOLS_LOCK:
+        pool = _HASH_POOLS.get(workers)
+        if pool is None:
+            # Spawned, not forked: forking a threaded server process can
+            # leave locks held in the children
+            pool = _HASH_POOLS[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        return pool
+
+
+def discard_hash_pool(pool):
+    """
+    Forget a pool whose processes died, so the next import starts a new one.
+    """
+    with _HASH_POOLS_LOCK:
+        for workers, known in list(_HASH_POOLS.items()):
+            if known is pool:
+                del _HASH_POOLS[workers]
+    pool.shutdown(wait=False)
+
+
+@dataclass
+class ImportResult:
+    created_users: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    rows_total: int = 0
+
+    @property
+    def rows_failed(self):
+        return self.rows_total - len(self.created_users)
+
+
+class UserCSVImporter:
+    """
+    Import users from an iterable of CSV dict rows.
+    :param chunk_size: Rows validated and inserted per transaction
+    :param hash_workers: Processes used for password hashing, at most
+        settings.USER_IMPORT_HASH_WORKERS (1 or less = inline)
+    :param on_progress: Called with the running ImportResult after each chunk
+    :param on_heartbeat: Called at most every ``heartbeat_interval`` seconds
+        while passwords are hashed, the slow part of a chunk
+    """
+
+    def __init__(
+        self,
+        chunk_size=IMPORT_CHUNK_SIZE,
+        hash_workers=None,
+        on_progress=None,
+        on_heartbeat=None,
+        heartbeat_interval=IMPORT_JOB_HEARTBEAT_INTERVAL,
+    ):
+        self.chunk_size = chunk_size
+        max_workers = getattr(settings, "USER_IMPORT_HASH_WORKERS", 1)
+        self.hash_workers = (
+            max_workers if hash_workers is None else min(hash_workers, max_workers)
+        )
+        self.on_progress = on_progress
+        self.on_heartbeat = on_heartbeat
+        self.heartbeat_interval = heartbeat_interval
+        self._last_heartbeat = time.monotonic()
+        self._seen_emails = set()
+        self._seen_mobile_numbers = set()
+
+    def run(self, rows):
+        result = ImportResult()
+        rows = enumerate(rows, start=1)
+        executor = None
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            result.rows_total += len(chunk)
+            if executor is None and self.hash_workers > 1 and len(chunk) >= POOL_THRESHOLD:
+                executor = get_hash_pool(self.hash_workers)
+            self._import_chunk(chunk, result, executor)
+            if self.on_progress is not None:
+                self.on_progress(result)
+        if result.created_users:
+            # bulk_create sends no post_save, so invalidate the user lists here
+            bump_cache_generation(User)
+        return result
+
+    def _import_chunk(self, chunk, result, executor):
+        errors = []
+        self._import_rows(chunk, result, executor, errors)
+        # Report errors in file order
+        result.errors.extend(message for _, message in sorted(errors))
+
+    def _import_rows(self, chunk, result, executor, errors):
+        candidates = []
+        for i, row in chunk:
+            try:
+                candidates.append((i, self._clean_row(i, row)))
+            except ValueError as e:
+                errors.append((i, str(e)))
+
+        # One query for every email/mobile number of the chunk
+        existing_emails, existing_mobile_numbers = set(), set()
+        for email, mobile_number in User.objects.filter(
+            Q(email__in=[data["email"] for _, data in candidates])
+            | Q(mobile_number__in=[data["mobile_number"] for _, data in candidates])
+        ).values_list("email", "mobile_number"):
+            existing_emails.add(email)
+            existing_mobile_numbers.add(mobile_number)
+
+        valid = []
+        for i, data in candidates:
+            if data["email"] in existing_emails or data["email"] in self._seen_emails:
+                errors.append((i, f"Row {i}: Email already exists."))
+            elif (
+                data["mobile_number"] in existing_mobile_numbers
+                or data["mobile_number"] in self._seen_mobile_numbers
+            ):
+                errors.append((i, f"Row {i}: Mobile number already exists."))
+            else:
+                self._seen_emails.add(data["email"])
+                self._seen_mobile_numbers.add(data["mobile_number"])
+                valid.append((i, data))
+        if not valid:
+            return
+
+        passwords = [data.pop("password") for _, data in valid]
+        hashed = self._hash_passwords(passwords, executor)
+        users = [
+            (i, User(password=password, **data))
+            for (i, data), password in zip(valid, hashed)
+        ]
+
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([user for _, user in users])
+        except IntegrityError:
+            # Someone else inserted a conflicting row meanwhile; find it row by row
+            for i, user in users:
+                try:
+                    with transaction.atomic():
+                        User.objects.bulk_create([user])
+                except IntegrityError:
+                    errors.append(
+                        (i, f"Row {i}: Email or mobile number already exists.")
+                    )
+                else:
+                    result.created_users.append(user.email)
+        else:
+            result.created_users.extend(user.email for _, user in users)
+
+    def _hash_passwords(self, passwords, executor):
+        if executor is not None:
+            results = executor.map(_hash_password, passwords, chunksize=16)
+        else:
+            results = map(_hash_password, passwords)
+        hashed = []
+        try:
+            for password in results:
+                hashed.append(password)
+                self._heartbeat()
+        except BrokenProcessPool:
+            discard_hash_pool(executor)
+            raise
+        return hashed
+
+    def _heartbeat(self):
+        now = time.monotonic()
+        if self.on_heartbeat is not None and (
+            now - self._last_heartbeat >= self.heartbeat_interval
+        ):
+            self._last_heartbeat = now
+            self.on_heartbeat()
+
+    def _clean_row(self, i, row):
+        for column in REQUIRED_COLUMNS:
+            if not (row.get(column) or "").strip():
+                raise ValueError(f"Row {i}: Missing {column}.")
+
+        email = User.objects.normalize_email(row["email"].strip())
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise ValueError(f"Row {i}: Enter a valid email address.")
+
+        try:
+            User.mobile_num_regex(row["mobile_number"].strip())
+            User.id_regex(row["identification"].strip())
+        except ValidationError as e:
+            raise ValueError(f"Row {i}: {e.messages[0]}")
+
+        password = row["password"]
+        if len(password) < 8:
+            raise ValueError(f"Row {i}: Password too short.")
+        if not any(c.isupper() for c in password):
+            raise ValueError(f"Row {i}: Password must contain uppercase letter.")
+        if not any(c.islower() for c in password):
+            raise ValueError(f"Row {i}: Password must contain lowercase letter.")
+        if not any(c.isdigit() for c in password):
+            raise ValueError(f"Row {i}: Password must contain digit.")
+
+        birthdate = (row.get("birthdate") or "").strip() or None
+        if birthdate is not None:
+            try:
+                birthdate = parse_date(birthdate)
+            except ValueError:
+                birthdate = None
+            if birthdate is None:
+                raise ValueError(f"Row {i}: Birthdate must be in YYYY-MM-DD format.")
+
+        gender = (row.get("gender") or "").strip() or None
+        if gender is not None and gender not in dict(User.GENDER_CHOICES):
+            raise ValueError(f"Row {i}: Invalid gender.")
+        user_type = row["user_type"].strip()
+        if user_type not in dict(User.USER_TYPES_CHOICES):
+            raise ValueError(f"Row {i}: Invalid user type.")
+
+        return {
+            "email": email,
+            "password": password,
+            "name": row["name"],
+            "name_ar": row["name_ar"],
+            "identification": row["identification"].strip(),
+            "birthdate": birthdate,
+            "position": row["position"],
+            "gender": gender,
+            "user_type": user_type,
+            "education": row.get("education", ""),
+            "home_address": row.get("home_address", ""),
+            "mobile_number": row["mobile_number"].strip(),
+        }
+
+
+# One import at a time per process; each import fans its hashing out already
+_JOB_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-import")
+
+
+def enqueue_import_job(job):
+    """
+    Run ``job`` in the background once the current transaction commits.
+    """
+    transaction.on_commit(lambda: _JOB_EXECUTOR.submit(run_import_job, job.pk))
+
+
+def run_import_job(job_id):
+    close_old_connections()
+    try:
+        # Claim the job, so it is never run twice
+        now = timezone.now()
+        claimed = UserImportJob.objects.filter(pk=job_id, status="pending").update(
+            status="running", started_at=now, updated_at=now
+        )
+        if not claimed:
+            return
+        job = UserImportJob.objects.get(pk=job_id)
+
+        # Only while it runs: a job failed by recovery stays failed
+        running = UserImportJob.objects.filter(pk=job_id, status="running")
+
+        def save_progress(result):
+            running.update(
+                rows_total=result.rows_total,
+                rows_done=len(result.created_users),
+                rows_failed=result.rows_failed,
+                updated_at=timezone.now(),
+            )
+
+        def heartbeat():
+            running.update(updated_at=timezone.now())
+
+        fields = {}
+        try:
+            with job.file.open("rb") as f:
+                reader = csv.DictReader(TextIOWrapper(f, encoding="utf-8"))
+                result = UserCSVImporter(
+                    on_progress=save_progress, on_heartbeat=heartbeat
+                ).run(reader)
+        except Exception as e:
+            logger.exception("User import job %s failed", job_id)
+            fields.update(status="failed", errors=[str(e)])
+        else:
+            fields.update(
+                status="done",
+                errors=result.errors,
+                rows_total=result.rows_total,
+                rows_done=len(result.created_users),
+                rows_failed=result.rows_failed,
+            )
+            if not result.rows_total:
+                fields.update(
+                    status="failed", errors=[_("The uploaded CSV file is empty.")]
+                )
+
+        # The upload holds plain-text passwords; don't keep it around
+        job.file.delete(save=False)
+        now = timezone.now()
+        finished = running.update(file="", finished_at=now, updated_at=now, **fields)
+        if not finished:
+            logger.warning("User import job %s finished after it was failed", job_id)
+    finally:
+        connections.close_all()
+
+
+def recover_import_jobs():
+    """
+    Queue again the jobs still pending and fail the ones whose process died
+    while running them. Safe to call from every process: a job is claimed
+    before it runs, and only stale running jobs are failed.
+    """
+    _JOB_EXECUTOR.submit(_recover_import_jobs)
+
+
+def _recover_import_jobs():
+    close_old_connections()
+    try:
+        stale = timezone.now() - IMPORT_JOB_STALE_AFTER
+        for job in UserImportJob.objects.filter(status="running", updated_at__lt=stale):
+            job.file.delete(save=False)
+            now = timezone.now()
+            failed = UserImportJob.objects.filter(
+                pk=job.pk, status="running", updated_at__lt=stale
+            ).update(
+                status="failed",
+                file="",
+                finished_at=now,
+                updated_at=now,
+                errors=job.errors
+                + [
+                    _(
+                        "The import was interrupted; the {} rows imported before "
+                        "were kept."
+                    ).format(job.rows_done)
+                ],
+            )
+            if failed:
+                logger.warning("User import job %s was interrupted", job.pk)
+        pending = UserImportJob.objects.filter(status="pending").values_list(
+            "pk", flat=True
+        )
+        for job_id in pending:
+            _JOB_EXECUTOR.submit(run_import_job, job_id)
+    except Exception:
+        # E.g. the table doesn't exist yet; nothing to recover then
+        logger.exception("Could not recover user import jobs")
+    finally:
+        connections.close_all()
@@ -0,0 +1,95 @@
+"""
+Login fast path.
+
+The user row comes back with its group names and permission codenames
+already aggregated, in a single query. Password hashing (PBKDF2) is
+bounded: however many logins arrive at once, at most LOGIN_HASH_WORKERS
+hashes are computed concurrently per process and the other logins wait for
+a slot, so a burst of logins can't take every CPU away from other requests.
+The check runs on the request thread itself, with no handoff to a pool.
+
+The user's auth version stamp is read before the row is loaded, so the
+token's claims are never stamped newer than they are. The stamp is keyed by
+the user's id, which is remembered per identifier; when that is unknown or
+out of date the row is loaded a second time, after reading the stamp.
+"""
+
+import hashlib
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models import OuterRef, Q, Subquery
+
+from lms_api.aggregates import JSONArrayAgg
+from lms_api.authentication import get_user_auth_version
+from user.models import User
+
+LOGIN_USER_ID_KEY = "login_user_id_{}"
+LOGIN_USER_ID_TIMEOUT = 60 * 60 * 24
+
+_HASH_SLOTS = threading.BoundedSemaphore(settings.LOGIN_HASH_WORKERS)
+
+
+def _names(model, field):
+    return Subquery(
+        model.objects.filter(user=OuterRef("pk"))
+        .order_by()
+        .values("user")
+        .annotate(names=JSONArrayAgg(field))
+        .values("names")
+    )
+
+
+def _load_login_user(identifier):
+    return (
+        User.objects.filter(Q(email=identifier) | Q(mobile_number=identifier))
+        .annotate(
+            group_names=_names(Group, "name"),
+            permission_codenames=_names(Permission, "codename"),
+        )
+        .first()
+    )
+
+
+def get_login_user(identifier):
+    """
+    Return the user whose email or mobile number is ``identifier``, with
+    ``group_names`` and ``permission_codenames`` lists and the
+    ``auth_version`` stamp read before the row, or None.
+    """
+    # Hashed, as emails may hold characters cache keys can't
+    key = LOGIN_USER_ID_KEY.format(hashlib.md5(str(identifier).encode()).hexdigest())
+    user_id = cache.get(key)
+    for _attempt in range(2):
+        auth_version = None if user_id is None else get_user_auth_version(user_id)
+        user = _load_login_user(identifier)
+        if user is None or user.pk == user_id:
+            break
+        user_id = user.pk
+        cache.set(key, user_id, LOGIN_USER_ID_TIMEOUT)
+    else:
+        # The identifier moved to another user meanwhile; issue no stamp
+        auth_version = None
+    if user is not None:
+        user.group_names = user.group_names or []
+        user.permission_codenames = user.permission_codenames or []
+        user.auth_version = auth_version
+    return user
+
+
+def verify_password(user, password):
+    """
+    Check ``password`` against ``user`` once a hashing slot is free. Like
+    user.check_password(), the stored hash is upgraded when the hasher's
+    settings have changed.
+    """
+    outdated = []
+    with _HASH_SLOTS:
+        is_correct = check_password(password, user.password, outdated.append)
+    if is_correct and outdated:
+        user.set_password(password)
+        user.save(update_fields=["password"])
+    return is_correct
@@ -1,13 +1,10 @@
 # Create your models here.
 from django.db import models
 from django.conf import settings
-from django.core.files.base import ContentFile
 from django.db.models.signals import post_save
 
 import uuid
 import os
-from PIL import Image
-from io import BytesIO
 
 
 from django.contrib.auth.models import (
@@ -103,7 +100,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     name_ar = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    identification = models.CharField(validators=[id_regex], max_length=15)
+    identification = models.CharField(validators=[id_regex], max_length=15, db_index=True)
     birthdate = models.DateField(blank=True, null=True)
     position = models.CharField(max_length=255)
     gender = models.CharField(
@@ -132,6 +129,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     )
     avatar = models.ImageField(blank=True, null=True, upload_to=user_photo_file_path)
     cover = models.ImageField(blank=True, null=True, upload_to=user_photo_file_path)
+    # Rendition storage names per image field, filled in by user.images
+    renditions = models.JSONField(default=dict, blank=True)
 
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=True)
@@ -141,68 +140,110 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = "email"
 
+    IMAGE_FIELDS = ("photo", "avatar", "cover")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored image names, so save() can release the replaced ones
+        instance._stored_images = {
+            field: value
+            for field, value in zip(field_names, values)
+            if field in cls.IMAGE_FIELDS
+        }
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        deferred = self.get_deferred_fields()
+        self._stored_images = {
+            **getattr(self, "_stored_images", {}),
+            **{
+                field: getattr(self, field).name
+                for field in self.IMAGE_FIELDS
+                if field not in deferred and (fields is None or field in fields)
+            },
+        }
+
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        deferred = self.get_deferred_fields()
+        # Only the image fields this save writes; reading a deferred one
+        # would cost a query
+        images = {
+            field: getattr(self, field)
+            for field in self.IMAGE_FIELDS
+            if field not in deferred
+            and (update_fields is None or field in update_fields)
+        }
+        stored = getattr(self, "_stored_images", {})
+        replaced = [
+            stored[field]
+            for field, file in images.items()
+            if stored.get(field) and stored[field] != file.name
+        ]
+        # New uploads (not committed to storage until saved) and newly
+        # assigned names; an unchanged image isn't processed again
+        changed = [
+            field
+            for field in ("photo", "cover")
+            if images.get(field)
+            and (
+                not images[field]._committed
+                or images[field].name != stored.get(field)
+            )
+        ]
         super().save(*args, **kwargs)
-        # Check if the photo exists and its size exceeds the maximum allowed size
-        if self.photo:
-            photo_size = self.photo.size  # Size in bytes
-            max_size_bytes = 1024 * 1024  # 1 MB
-
-            if photo_size > max_size_bytes:
-                # Resize the photo
-                self.resize_photo()
-
-            # Resize and save the avatar image
-            if not self.avatar:
-                self.resize_and_save_avatar()
-
-    def resize_photo(self):
-        # Set the maximum size in bytes (1 MB = 1024 * 1024 bytes)
-        max_size_bytes = 1024 * 1024
-
-        # Open the image using Pillow
-        with Image.open(self.photo.path) as img:
-            # Check the size of the image in bytes
-            img_byte_array = BytesIO()
-            img.save(img_byte_array, format=img.format)
-            img_size_bytes = img_byte_array.tell()
-
-            # If the image size exceeds the maximum size, resize it
-            if img_size_bytes > max_size_bytes:
-                # Calculate the scaling factor to resize the image
-                scaling_factor = (max_size_bytes / img_size_bytes) ** 0.5
-                new_width = int(img.width * scaling_factor)
-                new_height = int(img.height * scaling_factor)
-
-                # Resize the image
-                resized_img = img.resize((new_width, new_height))
-
-                # Save the resized image back to the photo field
-                buffer = BytesIO()
-                resized_img.save(buffer, format=img.format)
-                self.photo.save(
-                    os.path.basename(self.photo.name),
-                    ContentFile(buffer.getvalue()),
-                    save=True,
-                )
-
-    def resize_and_save_avatar(self):
-        # Check if the photo field is not empty
-        if self.photo:
-            photo_path = self.photo.path
-
-            # Check if the avatar field is not already set
-            # if not self.avatar:
-            # Open the image using Pillow
-        with Image.open(photo_path) as img:
-            # Resize the image (adjust the size as needed)
-            resized_img = img.resize((300, 300))
-
-            # Save the resized image as the avatar
-            buffer = BytesIO()
-            resized_img.save(buffer, format="PNG")
-            self.avatar.save("avatar.png", ContentFile(buffer.getvalue()), save=True)
+        from user.images import release_images, schedule_image_processing
+
+        self._stored_images = {
+            **stored,
+            **{field: file.name for field, file in images.items()},
+        }
+        if replaced:
+            release_images(replaced)
+        # Resize, build the avatar and the renditions off the request path
+        if changed:
+            schedule_image_processing(self.pk, changed)
 
     class Meta:
+        # Keyset pagination walks (created_at, id)
+        indexes = [models.Index(fields=["created_at", "id"])]
+
         def __str__(self):
             return self.email
+
+
+def user_import_file_path(instance, filename):
+    ext = os.path.splitext(filename)[1]
+    filename = f"{uuid.uuid4()}{ext}"
+    return os.path.join("uploads", "imports", filename)
+
+
+class UserImportJob(models.Model):
+    STATUS_CHOICES = [
+        ("pending", _("Pending")),
+        ("running", _("Running")),
+        ("done", _("Done")),
+        ("failed", _("Failed")),
+    ]
+
+    id = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
+    file = models.FileField(upload_to=user_import_file_path, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Moved on by every progress update while the job runs
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="user_import_jobs",
+        blank=True,
+        null=True,
+    )
@@ -2,11 +2,12 @@ from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.validators import RegexValidator
 from django.contrib.auth.models import Permission, Group
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from rest_framework import serializers
 
-from user.models import User
+from user.models import User, UserImportJob
 
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -31,6 +32,7 @@ class UserSerializer(serializers.ModelSerializer):
     )
     created_at = serializers.SerializerMethodField()
     updated_at = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = get_user_model()
@@ -53,6 +55,7 @@ class UserSerializer(serializers.ModelSerializer):
             "photo",
             "avatar",
             "cover",
+            "renditions",
             "groups",
             "user_permissions",
             "is_staff",
@@ -98,45 +101,52 @@ class UserSerializer(serializers.ModelSerializer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if "user_permissions" in self.fields:
-            self.fields["user_permissions"] = PermissionSerializer(
-                many=True, read_only=True
-            )
+            if self.compact_permissions:
+                # ?permissions=codename: a flat list of codenames
+                self.fields["user_permissions"] = serializers.SlugRelatedField(
+                    many=True, read_only=True, slug_field="codename"
+                )
+            else:
+                self.fields["user_permissions"] = PermissionSerializer(
+                    many=True, read_only=True
+                )
+
+    @property
+    def compact_permissions(self):
+        request = self.context.get("request")
+        query_params = getattr(request, "query_params", {})
+        return query_params.get("permissions") == "codename"
+
+    def sync_relations(self, user, relations):
+        # Only relations that were submitted; the field already resolved
+        # the objects, and set() only writes the difference
+        for field_name, targets in relations.items():
+            if targets is not None:
+                getattr(user, field_name).set(targets)
+
+    def pop_relations(self, validated_data):
+        return {
+            field_name: validated_data.pop(field_name, None)
+            for field_name in ("groups", "user_permissions")
+        }
 
     def create(self, validated_data):
-        groups_data = validated_data.pop("groups", [])
-        permissions_data = validated_data.pop("user_permissions", [])
+        relations = self.pop_relations(validated_data)
         password = validated_data.pop("password", None)
         user = super().create(validated_data)
 
-        for group_data in groups_data:
-            group_name = group_data.name
-            group = Group.objects.get(name=group_name)
-            user.groups.add(group)
-
-        for permission_data in permissions_data:
-            permission_codename = permission_data.codename
-            permission = Permission.objects.get(codename=permission_codename)
-            user.user_permissions.add(permission)
+        self.sync_relations(user, relations)
         if password:
             user.set_password(password)
             user.save()
         return user
 
     def update(self, instance, validated_data):
-        groups_data = validated_data.pop("groups", [])
-        permissions_data = validated_data.pop("user_permissions", [])
+        relations = self.pop_relations(validated_data)
         password = validated_data.pop("password", None)
         user = super().update(instance, validated_data)
 
-        user.groups.clear()  # Clear existing groups
-        for group_data in groups_data:
-            group_name = group_data.name
-            group = Group.objects.get(name=group_name)
-            user.groups.add(group)
-        user.user_permissions.clear()  # Clear existing permissions
-        for permission_data in permissions_data:
-            permission_codename = permission_data.codename
-            permission = Permission.objects.get(codename=permission_codename)
+        self.sync_relations(user, relations)
         if password:
             user.set_password(password)
             user.save()
@@ -149,6 +159,23 @@ class UserSerializer(serializers.ModelSerializer):
     def get_updated_at(self, obj):
         return obj.updated_at.strftime("%Y-%m-%d")
 
+    def get_renditions(self, obj):
+        # {"photo": {"small": {"webp": url, "jpeg": url}, ...}, "avatar": ..., "cover": ...}
+        request = self.context.get("request")
+        storage = obj.photo.storage
+
+        def url(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return {
+            field: {
+                size: {fmt: url(name) for fmt, name in formats.items()}
+                for size, formats in sizes.items()
+            }
+            for field, sizes in (obj.renditions or {}).items()
+        }
+
 
 class UserMeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -237,3 +264,30 @@ class UserGenderChoiceSerializer(serializers.Serializer):
 class UserTypeChoiceSerializer(serializers.Serializer):
     value = serializers.CharField()
     display = serializers.CharField()
+
+
+class UserImportJobSerializer(serializers.ModelSerializer):
+    rows_per_second = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserImportJob
+        fields = [
+            "id",
+            "status",
+            "rows_total",
+            "rows_done",
+            "rows_failed",
+            "rows_per_second",
+            "errors",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+    def get_rows_per_second(self, obj):
+        if obj.started_at is None:
+            return None
+        elapsed = ((obj.finished_at or timezone.now()) - obj.started_at).total_seconds()
+        if elapsed <= 0:
+            return None
+        return round((obj.rows_done + obj.rows_failed) / elapsed, 1)
@@ -0,0 +1,595 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from lms_api.authentication import (
+    StatelessJWTAuthentication,
+    bump_user_auth_versions,
+    issue_access_token,
+)
+from lms_api.custom_permissions import get_permission_snapshot
+from lms_api.testing import TempMediaRootMixin, create_user
+
+from user import images
+from user.images import (
+    AVATAR_SIZE,
+    RENDITIONS,
+    content_addressed_names,
+    delete_unreferenced_images,
+    is_content_addressed,
+    process_user_images,
+)
+from user import importers
+from user.importers import UserCSVImporter, run_import_job
+from user.login import get_login_user, verify_password
+from user.models import User, UserImportJob
+from user.serializers import UserSerializer
+
+USER_LIST_URL = "/en/api/users/user_list/"
+USER_RETRIEVE_URL = "/en/api/users/user_retrieve/"
+LOGIN_URL = "/en/api/users/login/"
+IMPORT_JOB_STATUS_URL = "/en/api/users/import_job_status/"
+MD5_HASHER = "django.contrib.auth.hashers.MD5PasswordHasher"
+PBKDF2_HASHER = "django.contrib.auth.hashers.PBKDF2PasswordHasher"
+
+
+class UserListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = create_user(0, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.permissions = list(Permission.objects.order_by("pk")[:3])
+        self.created = 0
+
+    def create_staff(self, count):
+        # Each with its own group and direct permissions, so an N+1 would show
+        for _ in range(count):
+            self.created += 1
+            user = create_user(self.created, is_staff=True)
+            user.groups.add(Group.objects.create(name=f"group{self.created}"))
+            user.user_permissions.add(*self.permissions)
+
+    def list_users(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(USER_LIST_URL, {"page_size": 100})
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"], len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_staff(2)
+        _results, few = self.list_users()
+        self.create_staff(8)
+        results, many = self.list_users()
+        self.assertEqual(len(results), 10)
+        self.assertEqual(many, few)
+
+    def test_groups_and_permissions_are_listed(self):
+        self.create_staff(1)
+        results, _queries = self.list_users()
+        self.assertEqual(results[0]["groups"], ["group1"])
+        listed = results[0]["user_permissions"]
+        self.assertEqual(
+            sorted(permission["codename"] for permission in listed),
+            sorted(permission.codename for permission in self.permissions),
+        )
+
+    def test_compact_permissions(self):
+        self.create_staff(1)
+        response = self.client.get(USER_LIST_URL, {"permissions": "codename"})
+        self.assertEqual(
+            sorted(response.data["results"][0]["user_permissions"]),
+            sorted(permission.codename for permission in self.permissions),
+        )
+
+    def test_group_change_invalidates_cached_list(self):
+        self.create_staff(1)
+        self.list_users()
+        User.objects.get(email="user1@a.com").groups.add(
+            Group.objects.create(name="late")
+        )
+        results, _queries = self.list_users()
+        self.assertEqual(sorted(results[0]["groups"]), ["group1", "late"])
+
+
+@override_settings(ALLOWED_HOSTS=["testserver", "other.example"])
+class UserRetrieveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        admin = create_user(0, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.user = create_user(1)
+        self.user.user_permissions.add(Permission.objects.get(codename="add_user"))
+
+    def retrieve(self, host="testserver", **params):
+        response = self.client.get(
+            USER_RETRIEVE_URL, {"user_id": str(self.user.pk), **params}, HTTP_HOST=host
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_permissions_formats_are_cached_apart(self):
+        self.assertEqual(
+            self.retrieve(permissions="codename")["user_permissions"], ["add_user"]
+        )
+        permissions = self.retrieve()["user_permissions"]
+        self.assertEqual(permissions[0]["codename"], "add_user")
+        self.assertEqual(
+            self.retrieve(permissions="codename")["user_permissions"], ["add_user"]
+        )
+
+    def test_absolute_urls_are_cached_per_host(self):
+        # Set without save(), so no image processing is scheduled
+        User.objects.filter(pk=self.user.pk).update(photo="photos/a.jpg")
+        self.assertTrue(self.retrieve()["photo"].startswith("http://testserver/"))
+        self.assertTrue(
+            self.retrieve(host="other.example")["photo"].startswith(
+                "http://other.example/"
+            )
+        )
+
+    def test_update_invalidates_every_variant(self):
+        self.retrieve()
+        self.retrieve(permissions="codename")
+        self.user.name = "renamed"
+        self.user.save()
+        self.assertEqual(self.retrieve()["name"], "renamed")
+        self.assertEqual(self.retrieve(permissions="codename")["name"], "renamed")
+
+
+class UserGroupsUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(1)
+        self.groups = [Group.objects.create(name=f"group{n}") for n in range(3)]
+        self.user.groups.add(*self.groups[:2])
+
+    def update(self, **data):
+        serializer = UserSerializer(self.user, data=data, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with CaptureQueriesContext(connection) as queries:
+            serializer.save()
+        return [query["sql"] for query in queries.captured_queries]
+
+    def group_names(self):
+        return set(self.user.groups.values_list("name", flat=True))
+
+    def group_codenames(self):
+        # A new object, as each request gets, so nothing is memoized on it
+        _permissions, codenames = get_permission_snapshot(
+            User.objects.get(pk=self.user.pk)
+        )
+        return codenames
+
+    def test_groups_are_replaced(self):
+        self.update(groups=["group1", "group2"])
+        self.assertEqual(self.group_names(), {"group1", "group2"})
+
+    def test_unchanged_groups_write_nothing(self):
+        queries = self.update(groups=["group0", "group1"])
+        writes = [
+            sql
+            for sql in queries
+            if "user_user_groups" in sql and sql.startswith(("INSERT", "DELETE"))
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(self.group_names(), {"group0", "group1"})
+
+    def test_groups_left_out_are_kept(self):
+        self.update(name="renamed")
+        self.assertEqual(self.group_names(), {"group0", "group1"})
+
+    def test_group_change_invalidates_permission_snapshot(self):
+        self.groups[2].permissions.add(Permission.objects.get(codename="view_user"))
+        self.assertEqual(self.group_codenames(), set())
+        self.update(groups=["group2"])
+        self.assertEqual(self.group_codenames(), {"view_user"})
+
+
+def image_upload(name="photo.png", size=(800, 600), color="red"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class UserImageTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = create_user(1)
+
+    def upload_photo(self, user, **kwargs):
+        user.photo = image_upload(**kwargs)
+        with mock.patch("user.images._IMAGE_EXECUTOR") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                user.save()
+                executor.submit.assert_not_called()
+        return executor
+
+    def test_save_defers_processing_until_commit(self):
+        executor = self.upload_photo(self.user)
+        executor.submit.assert_called_once_with(
+            process_user_images, self.user.pk, ("photo",)
+        )
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+        self.assertFalse(is_content_addressed(self.user.photo.name))
+
+    def test_processing_stores_photo_avatar_and_renditions(self):
+        self.upload_photo(self.user)
+        upload = self.user.photo.name
+        storage = self.user.photo.storage
+        process_user_images(self.user.pk, ["photo"])
+
+        self.user.refresh_from_db()
+        self.assertTrue(is_content_addressed(self.user.photo.name))
+        self.assertTrue(is_content_addressed(self.user.avatar.name))
+        with Image.open(self.user.avatar) as avatar:
+            self.assertEqual(avatar.size, AVATAR_SIZE)
+        self.assertEqual(
+            set(self.user.renditions["photo"]), set(RENDITIONS["photo"])
+        )
+        self.assertFalse(storage.exists(upload))
+
+    def test_identical_uploads_share_files(self):
+        other = create_user(2)
+        for user in (self.user, other):
+            self.upload_photo(user)
+            process_user_images(user.pk, ["photo"])
+            user.refresh_from_db()
+        self.assertEqual(self.user.photo.name, other.photo.name)
+        self.assertEqual(self.user.renditions, other.renditions)
+
+
+class UserImageCleanupTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = create_user(1)
+        self.storage = User._meta.get_field("photo").storage
+
+    def committed(self, func, *args):
+        # Background work (processing, cleanup) runs inline after commit
+        with mock.patch("user.images._IMAGE_EXECUTOR") as executor:
+            executor.submit.side_effect = lambda task, *task_args: task(*task_args)
+            with self.captureOnCommitCallbacks(execute=True):
+                func(*args)
+
+    def set_photo(self, user, color):
+        user.photo = image_upload(color=color)
+        self.committed(user.save)
+        user.refresh_from_db()
+        return content_addressed_names(
+            {
+                "photo": user.photo.name,
+                "avatar": user.avatar.name,
+                "renditions": user.renditions,
+            }
+        )
+
+    def assertStored(self, names, stored=True):
+        for name in names:
+            self.assertEqual(self.storage.exists(name), stored, name)
+
+    def test_replaced_images_are_deleted(self):
+        red = self.set_photo(self.user, "red")
+        self.assertStored(red)
+        blue = self.set_photo(self.user, "blue")
+        self.assertStored(blue)
+        self.assertStored(red - blue, stored=False)
+
+    def test_images_used_by_another_user_are_kept(self):
+        red = self.set_photo(self.user, "red")
+        self.set_photo(create_user(2), "red")
+        self.set_photo(self.user, "blue")
+        self.assertStored(red)
+
+    def test_deleted_user_images_are_deleted(self):
+        red = self.set_photo(self.user, "red")
+        self.committed(self.user.delete)
+        self.assertStored(red, stored=False)
+
+    def test_release_puts_back_files_taken_into_use_meanwhile(self):
+        red = self.set_photo(self.user, "red")
+        # The release saw no reference, then an upload committed one
+        in_use = [set(), red]
+        with mock.patch(
+            "user.images.names_in_use", side_effect=lambda names: in_use.pop(0)
+        ):
+            delete_unreferenced_images(red)
+        self.assertStored(red)
+
+    def test_processing_restores_reused_files_deleted_meanwhile(self):
+        red = self.set_photo(self.user, "red")
+        other = create_user(2)
+        store = images.store_content_addressed
+
+        def store_then_release(storage, data, extension):
+            # A release deletes the reused file before the row commits
+            name = store(storage, data, extension)
+            storage.delete(name)
+            return name
+
+        with mock.patch("user.images.store_content_addressed", store_then_release):
+            self.assertEqual(self.set_photo(other, "red"), red)
+        self.assertStored(red)
+
+
+class UserSaveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(1)
+        # Set without save(), so no image processing is scheduled
+        User.objects.filter(pk=self.user.pk).update(photo="photos/a.jpg")
+
+    def save(self, user, **kwargs):
+        with mock.patch("user.images._IMAGE_EXECUTOR") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                user.save(**kwargs)
+        return executor
+
+    def test_deferred_images_are_not_loaded(self):
+        user = User.objects.defer(*User.IMAGE_FIELDS).get(pk=self.user.pk)
+        user.name = "renamed"
+        with CaptureQueriesContext(connection) as queries:
+            self.save(user)
+        self.assertFalse(
+            any('"photo"' in query["sql"] for query in queries.captured_queries)
+        )
+        self.assertEqual(User.objects.get(pk=self.user.pk).name, "renamed")
+
+    def test_unchanged_photo_is_not_processed_again(self):
+        # Still without an avatar, as while its processing is pending
+        user = User.objects.get(pk=self.user.pk)
+        user.name = "renamed"
+        self.save(user).submit.assert_not_called()
+
+    def test_assigned_photo_is_processed(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.photo = "photos/b.jpg"
+        self.save(user).submit.assert_called_once_with(
+            process_user_images, user.pk, ("photo",)
+        )
+
+
+@override_settings(PASSWORD_HASHERS=[MD5_HASHER])
+class LoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(1, password="Passw0rdX")
+        group = Group.objects.create(name="teachers")
+        group.permissions.add(Permission.objects.get(codename="view_user"))
+        self.user.groups.add(group)
+        self.user.user_permissions.add(Permission.objects.get(codename="add_user"))
+        self.client = APIClient()
+
+    def login(self, identifier="user1@a.com", password="Passw0rdX"):
+        return self.client.post(
+            LOGIN_URL, {"identifier": identifier, "password": password}, format="json"
+        )
+
+    def test_login_costs_one_query(self):
+        # The first login also learns the user's id for the identifier
+        with self.assertNumQueries(2):
+            self.assertEqual(self.login().status_code, 200)
+        with self.assertNumQueries(1):
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["groups"], ["teachers"])
+        # Direct permissions only, as before
+        self.assertEqual(response.data["user_permissions"], ["add_user"])
+        self.assertTrue(response.data["access_token"])
+
+    def test_login_by_mobile_number(self):
+        response = self.login(identifier=self.user.mobile_number)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["identifier"], self.user.mobile_number)
+
+    def test_wrong_password_is_rejected(self):
+        self.assertEqual(self.login(password="Wr0ngPass").status_code, 401)
+        self.assertEqual(self.login(identifier="nobody@a.com").status_code, 401)
+
+    def test_concurrent_logins_wait_for_a_hashing_slot(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_check(password, encoded, setter):
+            with lock:
+                running.append(password)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(password)
+            return True
+
+        slots = threading.BoundedSemaphore(2)
+        with mock.patch("user.login._HASH_SLOTS", slots), mock.patch(
+            "user.login.check_password", slow_check
+        ):
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                results = list(
+                    pool.map(
+                        lambda n: verify_password(self.user, f"password{n}"), range(6)
+                    )
+                )
+        self.assertEqual(results, [True] * 6)
+        self.assertEqual(len(peak), 6)
+        self.assertEqual(max(peak), 2)
+
+    @override_settings(PASSWORD_HASHERS=[PBKDF2_HASHER, MD5_HASHER])
+    def test_outdated_hash_is_upgraded(self):
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        self.assertEqual(self.login().status_code, 200)
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(1, is_staff=True)
+
+    def issue_token(self):
+        user = get_login_user("user1@a.com")
+        return AccessToken(str(issue_access_token(user, user.auth_version)))
+
+    def authenticate(self, token):
+        return StatelessJWTAuthentication().get_user(token)
+
+    def save_user(self, **fields):
+        for name, value in fields.items():
+            setattr(self.user, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+    def test_current_token_costs_no_query(self):
+        token = self.issue_token()
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(user.is_staff)
+
+    def test_deleted_user_is_rejected(self):
+        token = self.issue_token()
+        self.save_user(is_deleted=True)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_deleted_claim_is_rejected(self):
+        self.save_user(is_deleted=True)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.issue_token())
+
+    def test_inactive_user_is_rejected(self):
+        token = self.issue_token()
+        self.save_user(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_write_after_loading_the_row_makes_token_stale(self):
+        user = get_login_user("user1@a.com")
+        # Committed between loading the row and issuing the token
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        bump_user_auth_versions(self.user.pk)
+        token = AccessToken(str(issue_access_token(user, user.auth_version)))
+        with self.assertNumQueries(1):
+            self.assertFalse(self.authenticate(token).is_staff)
+
+
+CSV_HEADER = (
+    "email,password,name,name_ar,identification,position,user_type,mobile_number\n"
+)
+
+
+def csv_row(number):
+    return (
+        f"import{number}@a.com,Passw0rdX,n,n,123456789,p,student,"
+        f"02{number:09d}\n"
+    )
+
+
+@override_settings(PASSWORD_HASHERS=[MD5_HASHER], USER_IMPORT_HASH_WORKERS=1)
+class UserImportJobTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.admin = create_user(0, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        # The background code closes its connections; keep the test's open
+        for name in ("close_old_connections", "connections"):
+            patcher = mock.patch.object(importers, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def create_job(self, rows=2, **fields):
+        content = CSV_HEADER + "".join(csv_row(n) for n in range(rows))
+        job = UserImportJob(created_by=self.admin, **fields)
+        job.file.save("users.csv", ContentFile(content.encode()), save=False)
+        job.save()
+        return job
+
+    def get_status(self, job_id):
+        return self.client.get(IMPORT_JOB_STATUS_URL, {"job_id": job_id})
+
+    def test_status_reports_progress(self):
+        job = self.create_job(rows=3)
+        run_import_job(job.pk)
+        response = self.get_status(str(job.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "done")
+        self.assertEqual(response.data["rows_total"], 3)
+        self.assertEqual(response.data["rows_done"], 3)
+        self.assertEqual(response.data["rows_failed"], 0)
+        self.assertEqual(User.objects.filter(email__startswith="import").count(), 3)
+
+    def test_unknown_or_malformed_job_id_is_not_found(self):
+        for job_id in ("not-a-uuid", "00000000-0000-0000-0000-000000000000", ""):
+            self.assertEqual(self.get_status(job_id).status_code, 404)
+
+    def test_recovery_fails_stale_jobs_and_requeues_pending_ones(self):
+        stale = self.create_job(status="running")
+        live = self.create_job(status="running")
+        pending = self.create_job()
+        UserImportJob.objects.filter(pk=stale.pk).update(
+            updated_at=timezone.now() - importers.IMPORT_JOB_STALE_AFTER * 2
+        )
+        with mock.patch.object(importers, "_JOB_EXECUTOR") as executor, self.assertLogs(
+            "user.importers", "WARNING"
+        ):
+            importers._recover_import_jobs()
+        executor.submit.assert_called_once_with(run_import_job, pending.pk)
+        stale.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual(stale.status, "failed")
+        self.assertFalse(stale.file)
+        self.assertEqual(live.status, "running")
+
+    def test_job_failed_by_recovery_is_not_marked_done(self):
+        job = self.create_job()
+        run = UserCSVImporter.run
+
+        def recovered_meanwhile(importer, rows):
+            result = run(importer, rows)
+            UserImportJob.objects.filter(pk=job.pk).update(status="failed")
+            return result
+
+        with mock.patch.object(
+            UserCSVImporter, "run", recovered_meanwhile
+        ), self.assertLogs("user.importers", "WARNING"):
+            run_import_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIsNone(job.finished_at)
+
+    def test_hashing_beats_within_a_chunk(self):
+        beats = []
+        importer = UserCSVImporter(
+            chunk_size=10,
+            on_heartbeat=lambda: beats.append(1),
+            heartbeat_interval=0,
+        )
+        rows = [
+            dict(zip(CSV_HEADER.strip().split(","), csv_row(n).strip().split(",")))
+            for n in range(4)
+        ]
+        result = importer.run(rows)
+        self.assertEqual(len(result.created_users), 4)
+        self.assertEqual(len(beats), 4)
@@ -18,6 +18,8 @@ from user.views import (
     forgot_password,
     ExportUserCSVTemplateView,
     ImportUserCSVView,
+    UserImportJobStatusView,
+    UserExportView,
 )
 
 app_name = "user"
@@ -44,4 +46,8 @@ urlpatterns = [
     path("forgot_password/", forgot_password, name="forgot_password"),
     path("export_user_template/", ExportUserCSVTemplateView.as_view(), name="export"),
     path("import_user_template/", ImportUserCSVView.as_view(), name="import"),
+    path(
+        "import_job_status/", UserImportJobStatusView.as_view(), name="import-job-status"
+    ),
+    path("user_export/", UserExportView.as_view(), name="user-export"),
 ]
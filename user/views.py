@@ -1,15 +1,12 @@
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
-from django.core.validators import validate_email
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
 from django.core.mail import send_mail
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django.core.cache import cache
+from django.contrib.auth.models import Group
 
 from django_filters.rest_framework import DjangoFilterBackend
 
@@ -25,9 +22,7 @@ from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.parsers import JSONParser
-
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.throttling import ScopedRateThrottle
 
 import uuid
 import csv
@@ -35,11 +30,11 @@ import logging
 import json
 import string
 import random
-from io import TextIOWrapper
 
 
 from user.models import (
     User,
+    UserImportJob,
 )
 from user.serializers import (
     UserSerializer,
@@ -50,28 +45,40 @@ from user.serializers import (
     UserDialogSerializer,
     UserGenderChoiceSerializer,
     UserTypeChoiceSerializer,
+    UserImportJobSerializer,
 )
 
 from user.filters import UserFilter
+from user.importers import IMPORT_CHUNK_SIZE, enqueue_import_job
+from user.login import get_login_user, verify_password
 
 from lms_api.pagination import StandardResultsSetPagination
-from lms_api.utils import get_or_set_cache, cache_response, clear_cache_key
+from lms_api.query_optimizer import OptimizedQuerySetMixin
+from lms_api.exporters import StreamingExportView
+from lms_api.field_index import find_existing_values
+from lms_api.bulk_actions import BulkStateChangeMixin
+from lms_api.utils import get_or_set_cache, get_or_set_detail_cache, cache_response
+from lms_api.cache_keys import VARY_LANGUAGE, VARY_QUERY, VARY_PERMISSIONS
+from lms_api.authentication import (
+    StatelessJWTAuthentication,
+    bump_user_auth_versions,
+    issue_access_token,
+)
 from lms_api.custom_permissions import HasPermissionOrInGroupWithPermission
 
 
 # User login view
 class LoginView(APIView):
     # Primary login view
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
 
     def post(self, request):
         identifier = request.data.get("identifier")  # Field for email or phone number
         password = request.data.get("password")
 
-        # Filter using Q objects to match either email or phone_number
-        user = User.objects.filter(
-            Q(email=identifier) | Q(mobile_number=identifier)
-        ).first()
+        # One query: the user matched by email or phone number, with its
+        # group names and permission codenames
+        user = get_login_user(identifier)
 
         if user is None:
             raise AuthenticationFailed(
@@ -85,30 +92,27 @@ class LoginView(APIView):
             raise AuthenticationFailed(_("User account is inactive"))
         if user.is_deleted == True:
             raise AuthenticationFailed(_("This user is deleted"))
-        if not user.check_password(password):
+        if not verify_password(user, password):
             raise AuthenticationFailed(
                 _("Email or phone number or password is invalid")
             )
 
-        refresh = RefreshToken.for_user(user)
+        # Only the access token is handed out, so don't mint a refresh token.
+        # Its claims let later requests authenticate without a query
+        access_token = issue_access_token(user, user.auth_version)
         response = Response()
-        # Extract group names and convert them to a list of strings
-        group_names = list(user.groups.values_list("name", flat=True))
-        user_permissions_names = list(
-            user.user_permissions.values_list("codename", flat=True)
-        )
 
         response.data = {
             "identifier": (
                 user.email if user.email == identifier else user.mobile_number
             ),
-            "groups": group_names,
-            "user_permissions": user_permissions_names,
+            "groups": user.group_names,
+            "user_permissions": user.permission_codenames,
             "name": user.name,
             "name_ar": user.name_ar,
             "user_type": user.user_type,
             "is_staff": user.is_staff,
-            "access_token": str(refresh.access_token),
+            "access_token": str(access_token),
             # "refresh_token": str(refresh),
         }
         return response
@@ -116,7 +120,7 @@ class LoginView(APIView):
 
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "user.add_user"
 
@@ -136,13 +140,12 @@ class CreateUserView(generics.CreateAPIView):
         )
 
 
-@method_decorator(cache_page(60 * 10), name="dispatch")  # 10 mins
-class UserListView(generics.ListAPIView):
+class UserListView(OptimizedQuerySetMixin, generics.ListAPIView):
     queryset = User.objects.filter(
         is_deleted=False, is_superuser=False, is_staff=True
     ).order_by("-created_at")
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "user.view_user"
 
@@ -159,12 +162,20 @@ class UserListView(generics.ListAPIView):
         "-created_at",
     ]
 
+    @cache_response(
+        timeout=60 * 10,  # 10 mins
+        key_prefix="user_list",
+        models=[User, Group],
+        vary=(VARY_LANGUAGE, VARY_QUERY, VARY_PERMISSIONS),
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-@method_decorator(cache_page(60 * 10), name="dispatch")  # 10 mins
-class DeletedUserView(generics.ListAPIView):
+
+class DeletedUserView(OptimizedQuerySetMixin, generics.ListAPIView):
     queryset = User.objects.filter(is_deleted=True).order_by("-created_at")
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "user.view_user"
     pagination_class = StandardResultsSetPagination
@@ -180,10 +191,19 @@ class DeletedUserView(generics.ListAPIView):
         "-created_at",
     ]
 
+    @cache_response(
+        timeout=60 * 10,  # 10 mins
+        key_prefix="user_deleted_list",
+        models=[User, Group],
+        vary=(VARY_LANGUAGE, VARY_QUERY, VARY_PERMISSIONS),
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class UserRetrieveView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "user.view_user"
     lookup_field = "id"
@@ -197,17 +217,28 @@ class UserRetrieveView(generics.RetrieveAPIView):
     #     return user
     def get_object(self):
         user_id = self.request.query_params.get("user_id")
-        cache_key = f"user_detail_{user_id}"
-        return get_or_set_cache(
-            cache_key,
-            lambda: get_object_or_404(self.get_queryset(), id=user_id),
+        return get_object_or_404(self.get_queryset(), id=user_id)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Cache the serialized payload; invalidated from User signals.
+        # It holds absolute image URLs and the ?permissions= format
+        user_id = request.query_params.get("user_id")
+        data = get_or_set_detail_cache(
+            "user",
+            user_id,
+            lambda: self.get_serializer(self.get_object()).data,
             timeout=300,
+            vary=(
+                request.build_absolute_uri("/"),
+                request.query_params.get("permissions", ""),
+            ),
         )
+        return Response(data)
 
 
 class UploadUserPhotoView(generics.UpdateAPIView):
     serializer_class = UserImageSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     # permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_classes = [IsAuthenticated]
     # permission_codename='user.change_user'
@@ -218,7 +249,7 @@ class UploadUserPhotoView(generics.UpdateAPIView):
 
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
-        user = self.request.user
+        user = User.objects.get(pk=self.request.user.pk)
         serializer = self.get_serializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -231,11 +262,11 @@ class UploadUserPhotoView(generics.UpdateAPIView):
         return self.serializer_class
 
     def update(self, request, *args, **kwargs):
-        user = self.request.user  # Get the user from the JWT token
+        # request.user only carries the token claims; load the whole row
+        user = User.objects.get(pk=self.request.user.pk)
         serializer = self.get_serializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            user.resize_and_save_avatar()
             return Response(
                 {"detail": _("Your photo changed successfully")},
                 status=status.HTTP_200_OK,
@@ -245,7 +276,7 @@ class UploadUserPhotoView(generics.UpdateAPIView):
 
 class UploadUserCoverView(generics.UpdateAPIView):
     serializer_class = UserCoverSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     # permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_classes = [IsAuthenticated]
     # permission_codename='user.change_user'
@@ -256,7 +287,7 @@ class UploadUserCoverView(generics.UpdateAPIView):
 
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
-        user = self.request.user
+        user = User.objects.get(pk=self.request.user.pk)
         serializer = self.get_serializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -269,7 +300,8 @@ class UploadUserCoverView(generics.UpdateAPIView):
         return self.serializer_class
 
     def update(self, request, *args, **kwargs):
-        user = self.request.user  # Get the user from the JWT token
+        # request.user only carries the token claims; load the whole row
+        user = User.objects.get(pk=self.request.user.pk)
         serializer = self.get_serializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -282,13 +314,14 @@ class UploadUserCoverView(generics.UpdateAPIView):
 
 class ManagerUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserMeSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     # permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_classes = [IsAuthenticated]
     # permission_codename = "user.change_user"
 
     def get_object(self):
-        return self.request.user
+        # request.user only carries the token claims; load the whole row
+        return User.objects.get(pk=self.request.user.pk)
 
     def update(self, request, *args, **kwargs):
 
@@ -297,91 +330,54 @@ class ManagerUserView(generics.RetrieveUpdateAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-        clear_cache_key(f"user_detail_{instance.id}")
 
         return Response(
             {"detail": _("Your data Updated successfully")}, status=status.HTTP_200_OK
         )
 
 
-class UserDeleteTemporaryView(generics.UpdateAPIView):
+class UserDeleteTemporaryView(BulkStateChangeMixin, generics.UpdateAPIView):
     serializer_class = UserDeleteSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "user.delete_user"
+    model = User
+    ids_param = "user_id"
+    state_value = True
+    detail_cache_prefix = "user"
+    conflicting_state_message = _("These users are not deleted")
+    already_in_state_message = _("User with ID {} is already temp deleted")
+    success_message = _("Users temp deleted successfully")
 
-    def update(self, request, *args, **kwargs):
-        user_ids = request.data.get("user_id", [])
-        partial = kwargs.pop("partial", False)
-        is_deleted = request.data.get("is_deleted")
+    def bulk_state_changed(self, ids):
+        super().bulk_state_changed(ids)
+        # is_deleted is one of the access token claims
+        bump_user_auth_versions(*ids)
 
-        if is_deleted == False:
-            return Response(
-                {"detail": _("These users are not deleted")},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        for user_id in user_ids:
-            instance = get_object_or_404(User, id=user_id)
-            if instance.is_deleted:
-                return Response(
-                    {
-                        "detail": _(
-                            "User with ID {} is already temp deleted".format(user_id)
-                        )
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            serializer = self.get_serializer(
-                instance, data=request.data, partial=partial
-            )
-            serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
-            clear_cache_key(f"user_detail_{user_id}")
 
-        return Response(
-            {"detail": _("Users temp deleted successfully")}, status=status.HTTP_200_OK
-        )
-
-
-class UserRestoreView(generics.RetrieveUpdateAPIView):
+class UserRestoreView(BulkStateChangeMixin, generics.RetrieveUpdateAPIView):
 
     serializer_class = UserDeleteSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "user.change_user"
+    model = User
+    ids_param = "user_id"
+    state_value = False
+    detail_cache_prefix = "user"
+    conflicting_state_message = _("users are already deleted")
+    already_in_state_message = _("User with ID {} is not deleted")
+    success_message = _("Users restored successfully")
 
-    def update(self, request, *args, **kwargs):
-        user_ids = request.data.get("user_id", [])
-        partial = kwargs.pop("partial", False)
-        is_deleted = request.data.get("is_deleted")
-
-        if is_deleted == True:
-            return Response(
-                {"detail": _("users are already deleted")},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        for user_id in user_ids:
-            instance = get_object_or_404(User, id=user_id)
-            if instance.is_deleted == False:
-                return Response(
-                    {"detail": _("User with ID {} is not deleted".format(user_id))},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            serializer = self.get_serializer(
-                instance, data=request.data, partial=partial
-            )
-            serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
-            clear_cache_key(f"user_detail_{user_id}")
-
-        return Response(
-            {"detail": _("Users restored successfully")}, status=status.HTTP_200_OK
-        )
+    def bulk_state_changed(self, ids):
+        super().bulk_state_changed(ids)
+        # is_deleted is one of the access token claims
+        bump_user_auth_versions(*ids)
 
 
 class UserUpdateView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "user.change_user"
     lookup_field = "id"
@@ -397,7 +393,6 @@ class UserUpdateView(generics.RetrieveUpdateAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
-        clear_cache_key(f"user_detail_{instance.id}")
 
         return Response(
             {"detail": _("User Updated successfully")}, status=status.HTTP_200_OK
@@ -405,7 +400,7 @@ class UserUpdateView(generics.RetrieveUpdateAPIView):
 
 
 class UserDeleteView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "user.delete_user"
 
@@ -421,8 +416,6 @@ class UserDeleteView(APIView):
 
         # Check if each UUID is valid
         for uid in user_id_list:
-            clear_cache_key(f"user_detail_{uid}")
-
             try:
                 uuid.UUID(uid.strip())
             except ValueError:
@@ -447,7 +440,7 @@ class UserDeleteView(APIView):
 class UserDialogView(generics.ListAPIView):
     serializer_class = UserDialogSerializer
     queryset = User.objects.filter(is_deleted=False, is_superuser=False)
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
 
@@ -466,7 +459,7 @@ class UserDialogView(generics.ListAPIView):
 #         serializer = UserGenderChoiceSerializer(gender_choices, many=True)
 #         return Response(serializer.data, status=status.HTTP_200_OK)
 class UserGenderDialogView(APIView):
-    @cache_response(timeout=1800, key_prefix="gender_dialog")
+    @cache_response(timeout=1800, key_prefix="gender_dialog", vary=(VARY_LANGUAGE,))
     def get(self, request, *args, **kwargs):
         return Response(
             [
@@ -579,7 +572,7 @@ def forgot_password(request):
 
 
 class ExportUserCSVTemplateView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "user.add_user"
 
@@ -608,7 +601,7 @@ class ExportUserCSVTemplateView(APIView):
 
 
 class ImportUserCSVView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
     permission_codename = "user.add_user"
     parser_classes = [MultiPartParser]
@@ -618,81 +611,132 @@ class ImportUserCSVView(APIView):
         if not csv_file or not csv_file.name.endswith(".csv"):
             return Response({"detail": _("Invalid file format.")}, status=400)
 
-        decoded_file = TextIOWrapper(csv_file.file, encoding="utf-8")
-        reader = csv.DictReader(decoded_file)
-
-        rows = list(reader)
-        if not rows:
+        if not csv_file.size:
             return Response(
                 {"detail": _("The uploaded CSV file is empty.")},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        created_users = []
-        errors = []
+        # Imported in the background; progress is polled from import_job_status/
+        job = UserImportJob.objects.create(file=csv_file, created_by=request.user)
+        enqueue_import_job(job)
+        return Response(
+            {"detail": _("Data import started."), "job_id": job.id},
+            status=status.HTTP_202_ACCEPTED,
+        )
 
-        for i, row in enumerate(rows, start=1):
-            try:
-                # Check for duplicates
-                if User.objects.filter(email=row["email"]).exists():
-                    raise ValueError(f"Row {i}: Email already exists.")
-
-                if User.objects.filter(mobile_number=row["mobile_number"]).exists():
-                    raise ValueError(f"Row {i}: Mobile number already exists.")
-
-                # Validate email
-                validate_email(row["email"])
-
-                # Validate password
-                password = row["password"]
-                if len(password) < 8:
-                    raise ValueError(f"Row {i}: Password too short.")
-                if not any(c.isupper() for c in password):
-                    raise ValueError(
-                        f"Row {i}: Password must contain uppercase letter."
-                    )
-                if not any(c.islower() for c in password):
-                    raise ValueError(
-                        f"Row {i}: Password must contain lowercase letter."
-                    )
-                if not any(c.isdigit() for c in password):
-                    raise ValueError(f"Row {i}: Password must contain digit.")
-
-                # Create the user
-                user = User.objects.create_user(
-                    email=row["email"],
-                    password=password,
-                    name=row["name"],
-                    name_ar=row["name_ar"],
-                    identification=row["identification"],
-                    birthdate=row["birthdate"],
-                    position=row["position"],
-                    gender=row["gender"],
-                    user_type=row["user_type"],
-                    education=row.get("education", ""),
-                    home_address=row.get("home_address", ""),
-                    mobile_number=row["mobile_number"],
-                )
 
-                created_users.append(user.email)
+class UserImportJobStatusView(generics.RetrieveAPIView):
+    serializer_class = UserImportJobSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
+    permission_codename = "user.add_user"
 
-            except Exception as e:
-                errors.append(str(e))
+    def get_object(self):
+        job_id = self.request.query_params.get("job_id")
+        try:
+            job_id = UserImportJob._meta.pk.to_python(job_id)
+        except ValidationError:
+            raise Http404
+        return get_object_or_404(UserImportJob, id=job_id)
+
+
+class CheckFieldsValueExistenceView(APIView):
+    """
+    Batched check_field_existence. POST either
+    ``{"checks": [{"field": "email", "value": "a@b.com"}, ...]}`` or, to
+    pre-validate an import file, ``{"rows": [{"email": ..., "mobile_number":
+    ...}, ...]}``; rows also flag values repeated by an earlier row.
+    Staff only, like the import it prepares, and throttled: each request
+    probes up to one import chunk of values.
+    """
+
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
+    permission_codename = "user.add_user"
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "check_fields_existence"
+    max_pairs = IMPORT_CHUNK_SIZE
 
-        if not errors:
-            return Response(
-                {
-                    "detail": _("Data imported successfully."),
-                    "created_users": created_users,
-                },
-                status=status.HTTP_200_OK,
-            )
+    def post(self, request):
+        checks = request.data.get("checks")
+        rows = request.data.get("rows")
+        if checks is not None:
+            if not isinstance(checks, list) or not all(
+                isinstance(check, dict) for check in checks
+            ):
+                return self.invalid()
+            pairs = [(check.get("field"), check.get("value")) for check in checks]
+        elif isinstance(rows, list) and all(isinstance(row, dict) for row in rows):
+            pairs = [pair for row in rows for pair in row.items()]
         else:
-            return Response(
+            return self.invalid()
+        if len(pairs) > self.max_pairs or not all(
+            isinstance(field, str) and field and isinstance(value, (str, int, float))
+            for field, value in pairs
+        ):
+            return self.invalid()
+
+        found = find_existing_values(pairs)
+        if checks is not None:
+            results = [
                 {
-                    "detail": _("Data failed to import. See errors below."),
-                    "created_users": created_users,
-                    "errors": errors,
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+                    "field": field,
+                    "value": value,
+                    "is_exist": bool(found[(field, value)]),
+                    "models": found[(field, value)],
+                }
+                for field, value in pairs
+            ]
+            return Response({"results": results}, status=status.HTTP_200_OK)
+
+        seen = set()
+        results = []
+        for row in rows:
+            result = {}
+            for field, value in row.items():
+                result[field] = {
+                    "is_exist": bool(found[(field, value)]),
+                    "models": found[(field, value)],
+                    "duplicated": (field, value) in seen,
+                }
+                seen.add((field, value))
+            results.append(result)
+        return Response({"rows": results}, status=status.HTTP_200_OK)
+
+    def invalid(self):
+        return Response(
+            {
+                "detail": _(
+                    "Send a list of field/value checks or rows of at most {} values."
+                ).format(self.max_pairs)
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class UserExportView(StreamingExportView):
+    queryset = User.objects.filter(is_deleted=False, is_superuser=False, is_staff=True)
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated, HasPermissionOrInGroupWithPermission]
+    permission_codename = "user.view_user"
+    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filterset_class = UserFilter
+    search_fields = ["name", "name_ar", "mobile_number", "email", "identification"]
+    export_fields = [
+        "id",
+        "email",
+        "name",
+        "name_ar",
+        "identification",
+        "birthdate",
+        "position",
+        "gender",
+        "user_type",
+        "education",
+        "home_address",
+        "mobile_number",
+        "is_active",
+        "created_at",
+    ]
+    export_filename = "users"